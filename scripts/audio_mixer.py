@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+时间轴混音 - 把配音片段按字幕开始时间混合成一条音轨
+特点：
+1. 每个片段只用 ffmpeg 解码一次为 PCM（并行解码），不再打开上千个输入；
+   也可以直接传入内存中的 PCM（流式 TTS 不落盘）
+2. 在预分配的 NumPy 缓冲区中按采样点偏移叠加，重叠部分直接相加
+3. 软限幅防止重叠处削波，最后只编码一次输出
+
+所有 TTS 后端 (tts_free / tts_chattts / tts) 共用这里的 mix_segments_with_timestamps
+"""
+
+import sys
+import os
+import wave
+import asyncio
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from stage_metrics import profiled, report_counts
+
+SAMPLE_RATE = 24000  # Edge TTS 与 ChatTTS 的原生采样率
+LIMIT_THRESHOLD = 0.9
+
+
+def run_command(cmd, description, input_bytes=None):
+    """执行命令并在失败时退出"""
+    result = subprocess.run(cmd, capture_output=True, input=input_bytes)
+    if result.returncode != 0:
+        print(f"❌ 失败: {description}")
+        if result.stderr:
+            print(result.stderr.decode('utf-8', errors='replace'))
+        sys.exit(1)
+    return result
+
+
+def decode_to_pcm(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """用 ffmpeg 把音频文件解码为单声道 float32 PCM"""
+    result = run_command(
+        ["ffmpeg", "-v", "error", "-i", path,
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        f"解码音频片段 {os.path.basename(path)}"
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+async def decode_stream_to_pcm(chunks, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """边接收边解码：把异步产生的压缩音频数据块送入 ffmpeg，返回单声道 int16 PCM
+
+    chunks: 异步迭代器，逐块产生 MP3 等压缩音频数据
+    """
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        finally:
+            proc.stdin.close()
+
+    try:
+        _, pcm_bytes, stderr = await asyncio.gather(feed(), proc.stdout.read(), proc.stderr.read())
+        returncode = await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg 解码失败: {stderr.decode('utf-8', errors='replace').strip()}")
+    return np.frombuffer(pcm_bytes, dtype=np.int16)
+
+
+async def iter_bytes(data: bytes):
+    """把一整块数据包装成 decode_stream_to_pcm 需要的异步迭代器"""
+    yield data
+
+
+def soft_limit(buffer: np.ndarray, threshold: float = LIMIT_THRESHOLD) -> int:
+    """对超过阈值的采样点做软限幅（原地修改），返回被压缩的采样点数"""
+    over = np.abs(buffer) > threshold
+    count = int(np.count_nonzero(over))
+    if count:
+        headroom = 1.0 - threshold
+        excess = (np.abs(buffer[over]) - threshold) / headroom
+        buffer[over] = np.sign(buffer[over]) * (threshold + headroom * np.tanh(excess))
+    return count
+
+
+def write_pcm(buffer: np.ndarray, output_audio: str, sample_rate: int = SAMPLE_RATE):
+    """把 float32 PCM 写成音频文件：.wav 直接写，其他格式交给 ffmpeg 编码"""
+    pcm = (np.clip(buffer, -1.0, 1.0) * 32767).astype(np.int16)
+
+    if output_audio.lower().endswith(".wav"):
+        with wave.open(output_audio, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sample_rate)
+            f.writeframes(pcm.tobytes())
+        return
+
+    run_command(
+        ["ffmpeg", "-y", "-v", "error",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "-",
+         "-c:a", "mp3", output_audio],
+        "编码混音结果",
+        input_bytes=pcm.tobytes(),
+    )
+
+
+def mix_pcm_segments(segments, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """把 [(start_ms, pcm), ...] 叠加到一条时间轴上，pcm 为 float32 或 int16"""
+    offsets = [max(0, int(start_ms)) * sample_rate // 1000 for start_ms, _ in segments]
+    length = max(offset + len(pcm) for offset, (_, pcm) in zip(offsets, segments))
+
+    buffer = np.zeros(length, dtype=np.float32)
+    for offset, (_, pcm) in zip(offsets, segments):
+        if pcm.dtype == np.int16:
+            buffer[offset:offset + len(pcm)] += pcm.astype(np.float32) / 32768.0
+        else:
+            buffer[offset:offset + len(pcm)] += pcm
+
+    clipped = soft_limit(buffer)
+    if clipped:
+        print(f"   重叠处软限幅 {clipped} 个采样点")
+    return buffer
+
+
+def mix_segments_with_timestamps(audio_segments, output_audio, sample_rate: int = SAMPLE_RATE,
+                                 workers: int = None):
+    """按字幕时间轴合并音频片段
+
+    audio_segments: [{"start_ms": int, "path": str} 或 {"start_ms": int, "pcm": np.ndarray}, ...]
+    """
+    if not audio_segments:
+        print("❌ 没有可用的音频片段")
+        sys.exit(1)
+
+    def load(seg):
+        if seg.get("pcm") is not None:
+            return seg["pcm"]
+        return decode_to_pcm(seg["path"], sample_rate)
+
+    # 解码是外部 ffmpeg 进程，线程池即可并行
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        pcms = list(pool.map(load, audio_segments))
+
+    with profiled("mix"):
+        buffer = mix_pcm_segments(
+            [(seg["start_ms"], pcm) for seg, pcm in zip(audio_segments, pcms)],
+            sample_rate,
+        )
+    write_pcm(buffer, output_audio, sample_rate)
+    report_counts(segments=len(audio_segments), audio_seconds=round(len(buffer) / sample_rate, 1))
+
+
+def mix_segments_amix(audio_segments, output_audio, temp_dir):
+    """旧实现：一个 ffmpeg 进程 + 每个片段一个输入的 adelay/amix 滤镜（仅用于基准对比）"""
+    filter_lines = []
+    mix_inputs = []
+    for idx, seg in enumerate(audio_segments):
+        delay_ms = max(0, int(seg["start_ms"]))
+        filter_lines.append(f"[{idx}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
+        mix_inputs.append(f"[a{idx}]")
+
+    filter_lines.append(
+        "".join(mix_inputs)
+        + f"amix=inputs={len(audio_segments)}:duration=longest:normalize=0[aout]"
+    )
+
+    filter_script = os.path.join(temp_dir, "mix.ffmpeg")
+    with open(filter_script, "w") as f:
+        f.write(";".join(filter_lines))
+
+    cmd = ["ffmpeg", "-y"]
+    for seg in audio_segments:
+        cmd.extend(["-i", seg["path"]])
+    cmd.extend([
+        "-filter_complex_script", filter_script,
+        "-map", "[aout]",
+        "-c:a", "mp3",
+        output_audio,
+    ])
+    run_command(cmd, "合并音频片段")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+批量处理 - 播放列表 / 频道 / URL 列表文件
+用法: python batch.py <播放列表或频道URL | urls.txt> [选项]
+
+按步骤类型调度多个视频:
+- 网络步骤 (下载、Google 翻译、Edge TTS) 最多 --network-jobs 个同时进行
+- CPU 步骤 (ChatTTS、合并编码、字幕烧录) 最多 --cpu-jobs 个同时进行
+视频 N 在编码时，视频 N+1 已经在下载和翻译，网络和 CPU 都不会闲着。
+"""
+
+import sys
+import os
+import time
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from process_free import (
+    OUTPUT_DIR, NETWORK, CPU,
+    StageRunner, fetch_video, process_video, add_processing_arguments, parse_processing_arguments, download_format,
+)
+from workspace import job_dir
+
+
+class StageGates:
+    """每类步骤一个信号量，gates(kind) 返回对应的并发闸门"""
+
+    def __init__(self, network_jobs: int, cpu_jobs: int):
+        self.semaphores = {
+            NETWORK: threading.BoundedSemaphore(network_jobs),
+            CPU: threading.BoundedSemaphore(cpu_jobs),
+        }
+
+    def __call__(self, kind):
+        return self.semaphores[kind]
+
+
+def read_sources(source: str) -> list:
+    """source 是文件时逐行读取 URL (忽略空行和 # 注释)，否则当作一个 URL"""
+    if os.path.isfile(source):
+        with open(source, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [source]
+
+
+def list_videos(sources: list, browser: str) -> list:
+    """展开播放列表/频道，返回去重后的 [(video_id, url), ...]"""
+    videos = []
+    seen = set()
+    for source in sources:
+        result = subprocess.run(
+            ["yt-dlp", "--cookies-from-browser", browser, "--flat-playlist", "--print", "id", source],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"⚠️ 无法解析: {source}\n{result.stderr.strip()}")
+            continue
+        for video_id in result.stdout.split():
+            if video_id not in seen:
+                seen.add(video_id)
+                videos.append((video_id, f"https://www.youtube.com/watch?v={video_id}"))
+    return videos
+
+
+def process_one(args, gates, video_id: str, url: str) -> dict:
+    """处理一个视频，中间文件放在该视频的工作区 work/<video_id>/"""
+    runner = StageRunner(force=args.force, gate=gates, label=f"[{video_id}] ")
+    start = time.perf_counter()
+    try:
+        entry = fetch_video(url, args.browser, runner, args.skip_download, video_id,
+                            overlap=not args.sequential_download, fragments=args.download_fragments,
+                            video_format=download_format(args))
+        outputs = process_video(args, runner, entry['video'], entry['srt'], job_dir(video_id), entry['title'])
+        error = None
+    except (Exception, SystemExit) as e:
+        outputs = None
+        error = str(e) or type(e).__name__
+    return {
+        "video_id": video_id,
+        "runner": runner,
+        "outputs": outputs,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量处理播放列表 / 频道 / URL 列表')
+    parser.add_argument('source', help='播放列表或频道 URL，或每行一个 URL 的文本文件')
+    parser.add_argument('--network-jobs', type=int, default=3,
+                        help='同时进行的网络步骤数 (下载/翻译/Edge TTS) (默认: 3)')
+    parser.add_argument('--cpu-jobs', type=int, default=1,
+                        help='同时进行的 CPU 步骤数 (ChatTTS/编码/烧录，每个都会用满多核) (默认: 1)')
+    parser.add_argument('--max-videos', type=int, default=None, help='最多处理多少个视频')
+    parser.add_argument('--skip-download', action='store_true',
+                        help='不联网下载，只处理已下载过的视频 (已下载过的视频默认也会自动复用)')
+    add_processing_arguments(parser)
+    args = parse_processing_arguments(parser)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    videos = list_videos(read_sources(args.source), args.browser)
+    if args.max_videos:
+        videos = videos[:args.max_videos]
+    if not videos:
+        print("❌ 没有找到可处理的视频")
+        sys.exit(1)
+
+    print(f"📋 共 {len(videos)} 个视频 (网络并发 {args.network_jobs}，CPU 并发 {args.cpu_jobs})")
+
+    gates = StageGates(args.network_jobs, args.cpu_jobs)
+    start = time.perf_counter()
+    # 同时在流水线中的视频数 = 两类步骤的并发数之和，保证两类资源都有活干
+    with ThreadPoolExecutor(max_workers=args.network_jobs + args.cpu_jobs) as pool:
+        futures = [pool.submit(process_one, args, gates, video_id, url) for video_id, url in videos]
+        results = [future.result() for future in futures]
+    wall = time.perf_counter() - start
+
+    stage_total = sum(seconds for r in results for _, seconds in r["runner"].timings)
+    failed = [r for r in results if r["error"]]
+
+    print(f"\n{'='*50}")
+    print(f"🎉 批量处理完成: 成功 {len(results) - len(failed)} / 失败 {len(failed)}")
+    print(f"{'='*50}")
+    for r in results:
+        if r["error"]:
+            print(f"❌ {r['video_id']}: {r['error']}")
+        else:
+            reused = f"，复用 {', '.join(r['runner'].reused)}" if r["runner"].reused else ""
+            print(f"✅ {r['video_id']} ({r['seconds']:.0f}s{reused}): {r['outputs']['video_with_subs']}")
+            if r["outputs"]["vertical"]:
+                print(f"   竖屏: {r['outputs']['vertical']}")
+    print(f"\n⏱️ 总耗时 {wall:.0f}s，各步骤耗时合计 {stage_total:.0f}s "
+          f"(并行节省 {max(0.0, stage_total - wall):.0f}s)")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
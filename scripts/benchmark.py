@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+"""
+性能基准测试
+用法: python benchmark.py [--json results.json] <benchmark> [选项]
+
+可用基准:
+  pipeline    整条流水线分步骤计时: 合并句子组 / 分割译文 / 翻译 / 配音 / 混音 / 合并视频 / 烧录字幕
+              使用合成的 SRT (有/无标点)、lavfi 生成的测试视频和可配置延迟、错误率的离线模拟翻译与 TTS
+  grouping    无标点自动字幕的句子组合并: 旧的无上限合并 vs 按字符数 / 条数 / 停顿切分 (5000 条)
+  parse       字幕解析/写出: subtitle_store (array 时间轴 + 驻留文本) vs pysrt (10000 条，SRT 和 VTT)
+  startup     每个步骤一个 Python 子进程 (启动 + 导入) vs 本进程内调用 pipeline.py 时的一次性导入耗时
+  encode      分段并行编码 / 烧录字幕在 1 / 2 / 4 / 8 段下的耗时和加速比 (lavfi 生成的长测试视频)
+  mix         NumPy 时间轴混音 vs 旧的 ffmpeg adelay/amix 滤镜 (100 / 1000 / 5000 个片段)
+  tts-batch   ChatTTS 按长度分桶动态分批 vs 按字幕顺序固定 10 条一批 (音频秒数 / 墙钟秒数)
+  tts-shard   ChatTTS 分片多进程合成在 1 / 2 / 4 / 8 个进程下的加速比和扩展效率
+  tts-profile ChatTTS 推理配置 default / cpu / cpu-compile 的实时率 (RTF) 和峰值内存 (需要安装 ChatTTS)
+"""
+
+import sys
+import os
+import time
+import json
+import wave
+import shutil
+import argparse
+import random
+import asyncio
+import tempfile
+import subprocess
+import contextlib
+
+import numpy as np
+
+from audio_mixer import mix_segments_with_timestamps, mix_segments_amix, run_command, SAMPLE_RATE
+from translate_google_v2 import (
+    merge_subtitle_groups, split_translation, translate_subtitles, pack_texts, is_sentence_end, PACK_SPLIT_RE, PACK_DELIMITER,
+    DEFAULT_PACK_CHARS,
+)
+from burn_subtitles import burn_subtitles, burn_subtitles_ass
+from chunked_encode import encode_chunked
+from stage_metrics import maxrss_mb
+import pipeline
+import subtitle_store
+from tts_chattts import synthesize_texts, synthesize_sharded, available_cores, DEFAULT_BATCH_BUDGET, PROFILES
+
+
+def timed(fn, *args, quiet: bool = False, **kwargs):
+    """运行函数并返回 (耗时秒数, 错误信息)；quiet=True 时屏蔽被测函数的输出"""
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, "w") if quiet else sys.stdout):
+            fn(*args, **kwargs)
+    except SystemExit:
+        return time.perf_counter() - start, "失败 (ffmpeg 退出)"
+    except Exception as e:
+        return time.perf_counter() - start, str(e)
+    return time.perf_counter() - start, None
+
+
+def write_tone(path: str, seconds: float, freq: float, sample_rate: int = SAMPLE_RATE):
+    """生成一个正弦波 wav 片段，模拟一条配音"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pcm = (0.3 * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def make_segments(temp_dir: str, count: int, spacing_ms: int = 1000, seconds: float = 1.5):
+    """生成 count 个相互部分重叠的音频片段"""
+    segments = []
+    for i in range(count):
+        path = os.path.join(temp_dir, f"segment_{i:05d}.wav")
+        write_tone(path, seconds, 220 + (i % 20) * 20)
+        segments.append({"path": path, "start_ms": i * spacing_ms})
+    return segments
+
+
+def bench_mix(args) -> list:
+    results = []
+    for count in args.counts:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            segments = make_segments(temp_dir, count)
+            mixers = [("numpy", mix_segments_with_timestamps),
+                      ("amix", lambda segments, output: mix_segments_amix(segments, output, temp_dir))]
+            for name, mixer in mixers:
+                if name == "amix" and count > args.amix_max:
+                    results.append({"benchmark": "mix", "impl": name, "segments": count,
+                                    "seconds": None, "error": "跳过 (--amix-max)"})
+                    continue
+                output = os.path.join(temp_dir, f"mix_{name}.mp3")
+                seconds, error = timed(mixer, segments, output)
+                results.append({"benchmark": "mix", "impl": name, "segments": count,
+                                "seconds": round(seconds, 3), "error": error})
+                print_result(results[-1])
+        finally:
+            shutil.rmtree(temp_dir)
+    return results
+
+
+class SimulatedChatTTS:
+    """模拟 ChatTTS 的批量推理耗时：每批固定开销 + 按填充后长度 (条数 × 最长文本) 计费
+
+    含 FAIL_MARK 的文本会让整批失败，模拟个别文本触发的推理错误
+    busy=True 时用忙循环代替 sleep，模拟占满一个核的推理，用于测试多进程扩展性
+    """
+
+    FAIL_MARK = "\u2620"
+
+    def __init__(self, batch_overhead: float = 0.05, token_seconds: float = 0.0005, busy: bool = False):
+        self.batch_overhead = batch_overhead
+        self.token_seconds = token_seconds
+        self.busy = busy
+
+    def set_threads(self, threads: int):
+        pass
+
+    def speaker(self, seed: int):
+        return seed
+
+    def infer(self, texts: list, seed: int, skip_refine: bool = False) -> list:
+        padded = len(texts) * max(len(text) for text in texts)
+        cost = self.batch_overhead + padded * self.token_seconds
+        if self.busy:
+            deadline = time.process_time() + cost
+            while time.process_time() < deadline:
+                pass
+        else:
+            time.sleep(cost)
+        if any(self.FAIL_MARK in text for text in texts):
+            raise RuntimeError("模拟推理失败")
+        # 中文语速约每秒 4 字
+        return [np.zeros(int(len(text) / 4 * SAMPLE_RATE), dtype=np.float32) for text in texts]
+
+
+def make_texts(count: int, fail_every: int = 0, seed: int = 0) -> list:
+    """长短不一的字幕文本，大多是短句，夹杂少量长句"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        length = rng.randint(4, 20) if rng.random() < 0.8 else rng.randint(40, 90)
+        text = "字" * length
+        if fail_every and i % fail_every == fail_every - 1:
+            text = SimulatedChatTTS.FAIL_MARK + text[1:]
+        texts.append(text)
+    return texts
+
+
+def fixed_batches(backend, texts: list, seed: int, size: int = 10) -> list:
+    """旧实现：按字幕顺序每 10 条一批，失败的批次整批丢弃"""
+    results = [None] * len(texts)
+    for start in range(0, len(texts), size):
+        try:
+            wavs = backend.infer(texts[start:start + size], seed)
+        except Exception:
+            continue
+        results[start:start + size] = wavs
+    return results
+
+
+def bench_tts_batch(args) -> list:
+    if args.real:
+        from tts_chattts import ChatTTSEngine
+        backend = ChatTTSEngine()
+    else:
+        backend = SimulatedChatTTS()
+    texts = make_texts(args.count, args.fail_every)
+
+    results = []
+    impls = [
+        ("fixed10", lambda: fixed_batches(backend, texts, 42)),
+        ("bucketed", lambda: synthesize_texts(backend, texts, 42, args.budget)),
+    ]
+    for name, run in impls:
+        start = time.perf_counter()
+        wavs = run()
+        seconds = time.perf_counter() - start
+        audio_seconds = sum(len(wav) for wav in wavs if wav is not None) / SAMPLE_RATE
+        results.append({"benchmark": "tts-batch", "impl": name, "texts": len(texts),
+                        "ok": sum(wav is not None for wav in wavs),
+                        "audio_per_second": round(audio_seconds / seconds, 2),
+                        "seconds": round(seconds, 3), "error": None})
+        print_result(results[-1])
+    return results
+
+
+def bench_tts_shard(args) -> list:
+    if args.real:
+        from tts_chattts import ChatTTSEngine
+        engine = ChatTTSEngine(args.profile)
+    else:
+        engine = SimulatedChatTTS(busy=True)
+    texts = make_texts(args.count)
+    cores = available_cores()
+
+    results = []
+    baseline = None
+    for workers in args.workers:
+        if workers > cores:
+            print(f"⚠️ 只有 {cores} 个可用核，{workers} 个进程的结果会偏低")
+        start = time.perf_counter()
+        wavs = synthesize_sharded(engine, texts, 42, workers)
+        seconds = time.perf_counter() - start
+        # 以第一个进程数的结果为基准，换算成单进程耗时
+        baseline = baseline or seconds * workers
+        audio_seconds = sum(len(wav) for wav in wavs if wav is not None) / SAMPLE_RATE
+        speedup = baseline / seconds
+        results.append({"benchmark": "tts-shard", "workers": workers, "texts": len(texts),
+                        "audio_per_second": round(audio_seconds / seconds, 2),
+                        "speedup": round(speedup, 2),
+                        "efficiency": round(speedup / workers, 2),
+                        "seconds": round(seconds, 3), "error": None})
+        print_result(results[-1])
+    return results
+
+
+def tts_profile_worker(args):
+    """子进程: 用一个推理配置加载模型并合成，结果以 JSON 输出到 stdout"""
+    from tts_chattts import ChatTTSEngine
+    engine = ChatTTSEngine(args.worker)
+    texts = ["这是一句用来测试语音合成速度的中文句子。"] * args.count
+
+    # 先合成一条预热 (cpu-compile 的编译发生在第一次推理)
+    start = time.perf_counter()
+    engine.infer(texts[:1], 42)
+    warmup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wavs = synthesize_texts(engine, texts, 42)
+    seconds = time.perf_counter() - start
+    audio_seconds = sum(len(wav) for wav in wavs if wav is not None) / SAMPLE_RATE
+    print(json.dumps({"load": engine.load_seconds, "warmup": warmup,
+                      "seconds": seconds, "audio_seconds": audio_seconds}))
+
+
+def bench_tts_profile(args) -> list:
+    """每个配置在独立子进程中运行，峰值内存 (RSS) 互不影响"""
+    results = []
+    for profile in args.profiles:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "tts-profile", "--worker", profile,
+             "--count", str(args.count)],
+            stdout=subprocess.PIPE, text=True,
+        )
+        output = proc.stdout.read()
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        result = {"benchmark": "tts-profile", "profile": profile, "texts": args.count,
+                  "peak_rss_mb": round(maxrss_mb(rusage))}
+        try:
+            stats = json.loads(output.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            result.update({"seconds": None, "error": f"子进程失败 (退出码 {proc.returncode})"})
+        else:
+            result.update({
+                "load_seconds": round(stats["load"], 1),
+                "warmup_seconds": round(stats["warmup"], 1),
+                "rtf": round(stats["seconds"] / max(stats["audio_seconds"], 1e-6), 3),
+                "seconds": round(stats["seconds"], 3),
+                "error": None,
+            })
+        results.append(result)
+        print_result(result)
+    return results
+
+
+WORDS = ("the quick brown fox jumps over a lazy dog while scientists measure how "
+         "light bends around massive stars and galaxies in the early universe").split()
+
+
+def make_srt(path: str, count: int, punctuated: bool = True, seed: int = 0, pauses: float = 0.0):
+    """生成 count 条英文字幕；punctuated=False 时完全没有句末标点 (自动生成字幕常见情况)
+
+    pauses: 字幕间出现较长停顿 (额外 0.5-1.5 秒) 的比例，默认每条间隔都是 0.2 秒
+    """
+    rng = random.Random(seed)
+    pause_rng = random.Random(seed + 1)
+    subs = subtitle_store.Subtitles()
+    sentence_left = rng.randint(1, 4)
+    start = 0
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10)))
+        sentence_left -= 1
+        if punctuated and sentence_left == 0:
+            text += rng.choice(".?!")
+            sentence_left = rng.randint(1, 4)
+        subs.append(start, start + 1800, text)
+        start += 2000
+        if pauses and pause_rng.random() < pauses:
+            start += pause_rng.randint(500, 1500)
+    subs.save(path)
+
+
+def make_test_video(path: str, seconds: int, size: str = "1280x720", fps: int = 30):
+    """用 ffmpeg lavfi 测试源生成带音轨的 H.264 视频"""
+    run_command([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={fps}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", path,
+    ], "生成测试视频")
+
+
+def fake_translation(text: str) -> str:
+    """按原文长度生成伪中文译文 (约 3 个英文字符对应 1 个汉字)，带逗号和句号"""
+    chars = []
+    for i in range(max(1, len(text) // 3)):
+        chars.append("译")
+        if i % 8 == 7:
+            chars.append("，")
+    return "".join(chars).rstrip("，") + "。"
+
+
+class FakeTranslator:
+    """离线模拟翻译器：固定延迟 + 按比例随机抛出限流错误，保留打包分隔符"""
+
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def translate(self, text: str) -> str:
+        time.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("429 Too Many Requests (模拟)")
+        return PACK_DELIMITER.join(fake_translation(part) for part in PACK_SPLIT_RE.split(text))
+
+
+def fake_synthesizer(latency: float = 0.05, error_rate: float = 0.0, seed: int = 0):
+    """离线模拟 Edge TTS：返回与 generate_audio_segment 相同签名的协程函数，语速约每秒 4 字"""
+    rng = random.Random(seed)
+
+    async def synthesize(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz"):
+        await asyncio.sleep(latency)
+        if rng.random() < error_rate:
+            raise RuntimeError("模拟合成失败")
+        return b"", tone_pcm(len(text) / 4)
+
+    return synthesize
+
+
+def tone_pcm(seconds: float, freq: float = 330.0) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16)
+
+
+def bench_pipeline(args) -> list:
+    temp_dir = tempfile.mkdtemp()
+    results = []
+
+    def record(stage, cues, punctuated, seconds, error, **extra):
+        results.append({"benchmark": "pipeline", "stage": stage, "cues": cues,
+                        "punctuated": punctuated, **extra,
+                        "seconds": round(seconds, 3) if seconds is not None else None, "error": error})
+        print_result(results[-1])
+
+    try:
+        video = os.path.join(temp_dir, "test.mp4")
+        video_error = None
+        if {"mux", "burn"} & set(args.stages):
+            seconds, video_error = timed(make_test_video, video, args.video_seconds, args.video_size, quiet=True)
+            print(f"   测试视频 {args.video_size} {args.video_seconds}s: "
+                  + (f"⚠️ {video_error}" if video_error else f"{seconds:.1f}s"))
+
+        for cues in args.cues:
+            for punctuated in args.punctuation:
+                tag = f"{cues}_{'p' if punctuated else 'np'}"
+                srt = os.path.join(temp_dir, f"{tag}.srt")
+                zh_srt = os.path.join(temp_dir, f"{tag}_zh.srt")
+                audio = os.path.join(temp_dir, f"{tag}.wav")
+                make_srt(srt, cues, punctuated)
+                subs = subtitle_store.load(srt)
+
+                if "merge" in args.stages:
+                    start = time.perf_counter()
+                    groups = merge_subtitle_groups(subs)
+                    record("merge", cues, punctuated, time.perf_counter() - start, None, groups=len(groups))
+
+                if "split" in args.stages:
+                    groups = merge_subtitle_groups(subs)
+                    multi = [(subs.flat_texts()[a:b + 1], fake_translation(text))
+                             for a, b, text in groups if b > a]
+                    start = time.perf_counter()
+                    for originals, translated in multi:
+                        split_translation(originals, translated)
+                    record("split", cues, punctuated, time.perf_counter() - start, None, groups=len(multi))
+
+                if "translate" in args.stages:
+                    seconds, error = timed(
+                        translate_subtitles, srt, zh_srt, None, args.translate_workers, 1000.0,
+                        translator_factory=lambda: FakeTranslator(args.translate_latency, args.error_rate),
+                        quiet=True,
+                    )
+                    record("translate", cues, punctuated, seconds, error)
+                if not os.path.exists(zh_srt):
+                    # 没有测翻译时直接生成伪译文，供后续步骤使用
+                    subs.with_texts([fake_translation(text) for text in subs.texts]).save(zh_srt)
+
+                if "tts" in args.stages:
+                    try:
+                        # edge_tts 只有真实合成时才需要，基准测试环境可能没装
+                        from tts_free import generate_tts
+                    except ImportError as e:
+                        record("tts", cues, punctuated, 0.0, f"无法导入 tts_free: {e}")
+                    else:
+                        synthesize = fake_synthesizer(args.tts_latency, args.error_rate)
+                        seconds, error = timed(
+                            lambda: asyncio.run(generate_tts(zh_srt, audio, concurrency=args.tts_concurrency,
+                                                             synthesize=synthesize)),
+                            quiet=True,
+                        )
+                        record("tts", cues, punctuated, seconds, error)
+
+                if "mix" in args.stages or not os.path.exists(audio):
+                    segments = [{"pcm": tone_pcm(len(text) / 4), "start_ms": start_ms}
+                                for start_ms, _, text in subtitle_store.load(zh_srt)]
+                    seconds, error = timed(mix_segments_with_timestamps, segments, audio, quiet=True)
+                    if "mix" in args.stages:
+                        record("mix", cues, punctuated, seconds, error, segments=len(segments))
+
+                if video_error:
+                    for stage in ("mux", "burn"):
+                        if stage in args.stages:
+                            record(stage, cues, punctuated, 0.0, f"没有测试视频: {video_error}")
+                    continue
+
+                if "mux" in args.stages:
+                    # 与 process_free 的合并步骤相同的命令：重新编码，以及测试视频 (H.264) 可用的视频流复制
+                    output = os.path.join(temp_dir, f"{tag}_final.mp4")
+                    for mode, copy_video in (("encode", False), ("copy", True)):
+                        cmd = pipeline.mux_command(video, audio, output, copy_video=copy_video)
+                        cmd[1:1] = ["-loglevel", "error"]
+                        seconds, error = timed(run_command, cmd, "合并视频", quiet=True)
+                        record("mux", cues, punctuated, seconds, error, mode=mode)
+
+                if "burn" in args.stages:
+                    output = os.path.join(temp_dir, f"{tag}_with_subs.mp4")
+                    seconds, error = timed(burn_subtitles, video, zh_srt, output, "ass", quiet=True)
+                    record("burn", cues, punctuated, seconds, error)
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+PIPELINE_STAGES = ["merge", "split", "translate", "tts", "mix", "mux", "burn"]
+
+
+def merge_unbounded(subs) -> list:
+    """旧的句子组合并：一直拼接到句末标点为止 (没有标点时整篇合成一组)，作为对照"""
+    groups = []
+    texts = subs.flat_texts()
+    i = 0
+    while i < len(texts):
+        start_idx = i
+        merged_text = texts[i]
+        while i < len(texts) - 1 and not is_sentence_end(merged_text):
+            i += 1
+            merged_text = merged_text + ' ' + texts[i]
+        groups.append((start_idx, i, merged_text))
+        i += 1
+    return groups
+
+
+def bench_grouping(args) -> list:
+    """无标点自动字幕的句子组合并：旧的无上限合并 vs 按字符数 / 条数 / 停顿切分，并统计打包后的请求大小"""
+    results = []
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for cues in args.cues:
+            path = os.path.join(temp_dir, f"{cues}.srt")
+            make_srt(path, cues, punctuated=False, pauses=args.pauses)
+            subs = subtitle_store.load(path)
+            for impl, fn in (("unbounded", merge_unbounded), ("bounded", merge_subtitle_groups)):
+                seconds = min(timed(fn, subs)[0] for _ in range(args.repeat))
+                groups = fn(subs)
+                texts = [text for _, _, text in groups]
+                requests = pack_texts(texts, DEFAULT_PACK_CHARS)
+                results.append({
+                    "benchmark": "grouping", "impl": impl, "cues": cues, "seconds": round(seconds, 4),
+                    "error": None, "groups": len(groups), "max_group_chars": max(map(len, texts)),
+                    "requests": len(requests),
+                    "max_request_chars": max(len(PACK_DELIMITER.join(pack)) for pack in requests),
+                })
+                print_result(results[-1])
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+def bench_parse(args) -> list:
+    """同一份字幕分别用 subtitle_store 和 pysrt 解析 / 写出，取多次运行的最小值"""
+    try:
+        import pysrt
+    except ImportError:
+        pysrt = None
+
+    def best(fn):
+        return min(timed(fn)[0] for _ in range(args.repeat))
+
+    results = []
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for cues in args.cues:
+            for fmt in ("srt", "vtt"):
+                path = os.path.join(temp_dir, f"{cues}.{fmt}")
+                out = os.path.join(temp_dir, f"{cues}_out.{fmt}")
+                make_srt(path, cues)
+                subs = subtitle_store.load(path)
+                impls = [("subtitle_store", "parse", lambda: subtitle_store.load(path)),
+                         ("subtitle_store", "write", lambda: subs.save(out))]
+                if fmt == "srt" and pysrt is not None:
+                    # pysrt 只支持 SRT
+                    items = pysrt.open(path, encoding="utf-8")
+                    impls += [("pysrt", "parse", lambda: pysrt.open(path, encoding="utf-8")),
+                              ("pysrt", "write", lambda: items.save(out, encoding="utf-8"))]
+                elif fmt == "srt":
+                    results.append({"benchmark": "parse", "impl": "pysrt", "format": fmt, "cues": cues,
+                                    "seconds": None, "error": "未安装 pysrt"})
+                    print_result(results[-1])
+
+                parse_seconds = {}
+                for impl, op, fn in impls:
+                    seconds = best(fn)
+                    if op == "parse":
+                        parse_seconds[impl] = seconds
+                    results.append({"benchmark": "parse", "impl": impl, "op": op, "format": fmt,
+                                    "cues": cues, "seconds": round(seconds, 4), "error": None})
+                    print_result(results[-1])
+                if "pysrt" in parse_seconds:
+                    print(f"   解析加速: {parse_seconds['pysrt'] / max(parse_seconds['subtitle_store'], 1e-9):.1f}x")
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGE_MODULES = ["translate_google_v2", "tts_free", "tts_chattts", "burn_subtitles"]
+HEAVY_MODULES = ["deep_translator", "edge_tts", "torch", "ChatTTS", "moviepy", "numpy"]
+IMPORT_PROBE = """
+import sys, time, json
+sys.path.insert(0, {scripts!r})
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe_imports(modules: list) -> dict:
+    """在新的解释器中导入 modules，返回导入耗时和被连带导入的重量级模块"""
+    code = IMPORT_PROBE.format(scripts=SCRIPTS_DIR, modules=modules, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"seconds": None, "heavy": [], "error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout)
+
+
+def bench_startup(args) -> list:
+    """每个步骤一个子进程时，解释器启动和模块导入的开销每个视频每步都要付一次；
+    本进程内调用时只在第一次用到某个后端时导入一次"""
+    def best(fn):
+        return min(fn() for _ in range(args.repeat))
+
+    def spawn(*argv):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *argv], capture_output=True)
+        return time.perf_counter() - start
+
+    results = []
+    interpreter = best(lambda: spawn("-c", "pass"))
+    results.append({"benchmark": "startup", "mode": "interpreter", "stage": "-",
+                    "seconds": round(interpreter, 3), "error": None})
+    print_result(results[-1])
+    for module in STAGE_MODULES:
+        # 不带参数运行脚本：打印用法后退出，耗时就是启动 + 导入
+        seconds = best(lambda: spawn(os.path.join(SCRIPTS_DIR, f"{module}.py")))
+        results.append({"benchmark": "startup", "mode": "subprocess", "stage": module,
+                        "seconds": round(seconds, 3), "error": None})
+        print_result(results[-1])
+        probe = probe_imports([module])
+        results.append({"benchmark": "startup", "mode": "import", "stage": module, "heavy": probe["heavy"],
+                        "seconds": round(probe["seconds"], 3) if probe["seconds"] is not None else None,
+                        "error": probe.get("error")})
+        print_result(results[-1])
+
+    # 本进程内的整条流水线：编排进程启动一次，只导入 pipeline 和选中的后端
+    for backend in ("tts_free", "tts_chattts"):
+        probe = probe_imports(["pipeline", "translate_google_v2", backend, "burn_subtitles"])
+        results.append({"benchmark": "startup", "mode": "in-process", "stage": f"pipeline+{backend}",
+                        "heavy": probe["heavy"],
+                        "seconds": round(probe["seconds"], 3) if probe["seconds"] is not None else None,
+                        "error": probe.get("error")})
+        print_result(results[-1])
+    subprocess_total = sum(r["seconds"] for r in results if r["mode"] == "subprocess")
+    print(f"   每个视频的子进程启动开销合计 {subprocess_total:.2f}s (解释器本身 {interpreter:.3f}s/次)")
+    return results
+
+
+def bench_encode(args) -> list:
+    """同一个测试视频分别按不同段数重新编码 (encode) 和烧录字幕 (burn)，加速比以第一个段数为基准"""
+    results = []
+    temp_dir = tempfile.mkdtemp()
+    try:
+        video = os.path.join(temp_dir, "test.mp4")
+        seconds, error = timed(make_test_video, video, args.video_seconds, args.video_size, quiet=True)
+        if error:
+            return [{"benchmark": "encode", "seconds": None, "error": f"没有测试视频: {error}"}]
+        print(f"   测试视频 {args.video_size} {args.video_seconds}s: {seconds:.1f}s")
+        srt = os.path.join(temp_dir, "test.srt")
+        make_srt(srt, args.video_seconds // 2)
+        subs = subtitle_store.load(srt)
+
+        for mode in ("encode", "burn"):
+            baseline = None
+            for chunks in args.chunks:
+                output = os.path.join(temp_dir, f"{mode}_{chunks}.mp4")
+                if mode == "encode":
+                    seconds, error = timed(encode_chunked, video, output, None, chunks, quiet=True)
+                else:
+                    seconds, error = timed(burn_subtitles_ass, video, subs, output, None, chunks, quiet=True)
+                baseline = baseline or seconds
+                results.append({"benchmark": "encode", "mode": mode, "chunks": chunks,
+                                "speedup": round(baseline / seconds, 2) if not error else None,
+                                "seconds": round(seconds, 3), "error": error})
+                print_result(results[-1])
+    finally:
+        shutil.rmtree(temp_dir)
+    return results
+
+
+BENCHMARKS = {
+    "pipeline": bench_pipeline,
+    "encode": bench_encode,
+    "parse": bench_parse,
+    "grouping": bench_grouping,
+    "startup": bench_startup,
+    "mix": bench_mix,
+    "tts-batch": bench_tts_batch,
+    "tts-shard": bench_tts_shard,
+    "tts-profile": bench_tts_profile,
+}
+
+
+def git_commit():
+    """当前代码版本，写进结果文件便于对比不同版本"""
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return result.stdout.strip() or None
+
+
+def print_result(result: dict):
+    label = " ".join(f"{k}={v}" for k, v in result.items()
+                     if k not in ("benchmark", "seconds", "error"))
+    if result.get("error"):
+        print(f"   {result['benchmark']:<8} {label:<40} ⚠️ {result['error']}")
+    else:
+        print(f"   {result['benchmark']:<8} {label:<40} {result['seconds']:>8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试')
+    parser.add_argument('--json', default=None, help='把结果写入 JSON 文件，便于版本间对比')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    p = sub.add_parser('pipeline', help='整条流水线分步骤计时 (离线模拟翻译和 TTS)')
+    p.add_argument('--cues', type=int, nargs='+', default=[100, 1000, 10000],
+                   help='字幕条数 (默认: 100 1000 10000)')
+    p.add_argument('--punctuation', choices=['both', 'yes', 'no'], default='both',
+                   help='合成字幕是否带句末标点 (默认: both，两种都测)')
+    p.add_argument('--stages', nargs='+', choices=PIPELINE_STAGES, default=PIPELINE_STAGES,
+                   help=f'要计时的步骤 (默认: 全部)')
+    p.add_argument('--translate-latency', type=float, default=0.2,
+                   help='模拟翻译每个请求的延迟秒数 (默认: 0.2)')
+    p.add_argument('--translate-workers', type=int, default=4, help='翻译并发数 (默认: 4)')
+    p.add_argument('--tts-latency', type=float, default=0.05,
+                   help='模拟 TTS 每条的延迟秒数 (默认: 0.05)')
+    p.add_argument('--tts-concurrency', type=int, default=20, help='TTS 并发数 (默认: 20)')
+    p.add_argument('--error-rate', type=float, default=0.02,
+                   help='模拟翻译/TTS 请求失败的比例 (默认: 0.02)')
+    p.add_argument('--video-seconds', type=int, default=60, help='测试视频时长 (默认: 60)')
+    p.add_argument('--video-size', default='1280x720', help='测试视频分辨率 (默认: 1280x720)')
+
+    p = sub.add_parser('parse', help='字幕解析/写出 subtitle_store vs pysrt')
+    p.add_argument('--cues', type=int, nargs='+', default=[10000], help='字幕条数 (默认: 10000)')
+    p.add_argument('--repeat', type=int, default=5, help='每项重复次数，取最快一次 (默认: 5)')
+
+    p = sub.add_parser('grouping', help='无标点字幕的句子组合并 (无上限 vs 有上限)')
+    p.add_argument('--cues', type=int, nargs='+', default=[5000], help='字幕条数 (默认: 5000)')
+    p.add_argument('--pauses', type=float, default=0.15,
+                   help='字幕间出现较长停顿的比例 (默认: 0.15)')
+    p.add_argument('--repeat', type=int, default=5, help='每项重复次数，取最快一次 (默认: 5)')
+
+    p = sub.add_parser('startup', help='子进程启动 + 导入 vs 本进程内一次性导入')
+    p.add_argument('--repeat', type=int, default=5, help='每项重复次数，取最快一次 (默认: 5)')
+
+    p = sub.add_parser('encode', help='分段并行编码 / 烧录字幕的加速比')
+    p.add_argument('--chunks', type=int, nargs='+', default=[1, 2, 4, 8],
+                   help='要测试的段数，第一个作为基准 (默认: 1 2 4 8)')
+    p.add_argument('--video-seconds', type=int, default=600, help='测试视频时长 (默认: 600)')
+    p.add_argument('--video-size', default='1920x1080', help='测试视频分辨率 (默认: 1920x1080)')
+
+    p = sub.add_parser('mix', help='时间轴混音')
+    p.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 5000],
+                   help='片段数量 (默认: 100 1000 5000)')
+    p.add_argument('--amix-max', type=int, default=5000,
+                   help='旧 amix 实现最多测试的片段数，太多会超出文件描述符上限 (默认: 5000)')
+
+    p = sub.add_parser('tts-batch', help='ChatTTS 分批策略吞吐量')
+    p.add_argument('--count', type=int, default=200, help='字幕条数 (默认: 200)')
+    p.add_argument('--budget', type=int, default=DEFAULT_BATCH_BUDGET,
+                   help=f'分桶批次的填充长度上限 (默认: {DEFAULT_BATCH_BUDGET})')
+    p.add_argument('--fail-every', type=int, default=0,
+                   help='每隔多少条放一条会导致推理失败的文本 (默认: 0，不注入失败)')
+    p.add_argument('--real', action='store_true', help='使用真实 ChatTTS 模型 (默认用模拟耗时)')
+
+    p = sub.add_parser('tts-shard', help='ChatTTS 分片多进程扩展性')
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                   help='要测试的进程数，第一个作为基准 (默认: 1 2 4 8)')
+    p.add_argument('--count', type=int, default=200, help='字幕条数 (默认: 200)')
+    p.add_argument('--profile', default='cpu', choices=list(PROFILES),
+                   help='--real 时的推理配置 (默认: cpu)')
+    p.add_argument('--real', action='store_true', help='使用真实 ChatTTS 模型 (默认用模拟的 CPU 负载)')
+
+    p = sub.add_parser('tts-profile', help='ChatTTS 推理配置的 RTF 和峰值内存')
+    p.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES),
+                   help=f'要对比的配置 (默认: {" ".join(PROFILES)})')
+    p.add_argument('--count', type=int, default=20, help='合成的句子数 (默认: 20)')
+    p.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if getattr(args, "worker", None):
+        tts_profile_worker(args)
+        return
+    if args.benchmark == "pipeline":
+        args.punctuation = {"both": [True, False], "yes": [True], "no": [False]}[args.punctuation]
+
+    print(f"⏱️ 基准测试: {args.benchmark}")
+    results = BENCHMARKS[args.benchmark](args)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+                       "argv": sys.argv[1:], "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"📁 结果保存到: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,257 @@
 #!/usr/bin/env python3
 """
 字幕烧录脚本 - 将 SRT 字幕烧录到视频中
-用法: python burn_subtitles.py <video.mp4> <subtitles.srt> [output.mp4]
+用法: python burn_subtitles.py <video.mp4> <subtitles.srt> [output.mp4] [--engine ass|moviepy] [--audio dub.mp3] [--chunks N] [--vertical blur|crop]
+
+引擎:
+  ass      (默认) SRT 转为带样式的 ASS，ffmpeg + libass 一次原生编码完成
+  moviepy  逐条生成 TextClip 在 Python 中合成，速度慢，作为备用
+
+--audio: 用配音替换原视频音轨，配音合并和字幕烧录在同一次编码中完成
+--chunks: ass 引擎按关键帧分段并行编码 (每段只含本段的字幕)，0 表示按时长和核数自动选择
+--vertical blur|crop: ass 引擎同时输出 1080x1920 竖屏版 (与横屏版共用一次解码，在同一个滤镜图中完成)
+  blur  视频完整缩放到竖屏宽度居中，上下用放大模糊的画面填充
+  crop  放大到铺满竖屏后居中裁剪
 """
 
 import sys
 import os
-import pysrt
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip
+import time
+import argparse
+import shutil
+import tempfile
+import subprocess
+from media_probe import probe_video
+from chunked_encode import encode_chunked, auto_chunks, available_cores, filter_args, output_map
+from stage_metrics import profiled, report_counts
+from subtitle_store import Subtitles, as_subtitles
 
-def burn_subtitles(video_path: str, srt_path: str, output_path: str = None):
-    """使用 moviepy 烧录字幕"""
+# 字幕样式（两个引擎保持一致的外观）
+FONT_FILE = '/System/Library/Fonts/STHeiti Medium.ttc'
+FONT_NAME = 'STHeiti'
+FONT_SIZE = 48
+STROKE_WIDTH = 2
+BOTTOM_OFFSET = 120     # 字幕顶部距视频底部的像素
+TEXT_WIDTH_RATIO = 0.9  # 字幕最大宽度占视频宽度比例
 
-    if output_path is None:
-        base, ext = os.path.splitext(video_path)
-        output_path = f"{base}_subtitled{ext}"
+# 抖音竖屏输出：底部约 1/4 被标题、文案和进度条遮挡，右侧有点赞/评论按钮，字幕放在安全区内
+VERTICAL_WIDTH = 1080
+VERTICAL_HEIGHT = 1920
+VERTICAL_MODES = ("blur", "crop")
+VERTICAL_MARGIN_V = int(VERTICAL_HEIGHT * 0.25)  # 字幕底部距画面底部
+VERTICAL_MARGIN_H = int(VERTICAL_WIDTH * 0.12)   # 左右留出按钮栏的宽度
+
+
+def ass_timestamp(ms: int) -> str:
+    """毫秒转 ASS 时间格式 H:MM:SS.cc"""
+    cs = max(0, ms) // 10
+    h, cs = divmod(cs, 360000)
+    m, cs = divmod(cs, 6000)
+    s, cs = divmod(cs, 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def ass_escape(text: str) -> str:
+    """转义 ASS 覆盖标签用的花括号和反斜杠，换行合并为空格（与 moviepy 引擎一致）"""
+    text = text.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}')
+    return text.replace('\n', ' ')
+
+
+def srt_to_ass(subs: Subtitles, ass_path: str, width: int, height: int, margin_v: int = None,
+               margin_h: int = None):
+    """把 SRT 字幕写成带样式的 ASS 文件，坐标系与视频像素一致
+
+    margin_v: 字幕底部距视频底部的像素，默认与 moviepy 引擎位置一致
+    margin_h: 字幕左右边距，默认按 TEXT_WIDTH_RATIO
+    """
+    if margin_v is None:
+        # moviepy 把单行字幕的顶部放在 h - BOTTOM_OFFSET，行高约 1.25 倍字号
+        margin_v = BOTTOM_OFFSET - int(FONT_SIZE * 1.25)
+    if margin_h is None:
+        margin_h = int(width * (1 - TEXT_WIDTH_RATIO) / 2)
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{FONT_NAME},{FONT_SIZE},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,"
+        f"0,0,0,0,100,100,0,0,1,{STROKE_WIDTH},0,2,{margin_h},{margin_h},{margin_v},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for start, end, text in zip(subs.starts, subs.ends, subs.flat_texts()):
+        if not text:
+            continue
+        lines.append(
+            f"Dialogue: 0,{ass_timestamp(start)},{ass_timestamp(end)},"
+            f"Default,,0,0,0,,{ass_escape(text)}"
+        )
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return ass_path
+
+
+def escape_filter_path(path: str) -> str:
+    """转义 ffmpeg 滤镜参数中的路径"""
+    return path.replace('\\', '\\\\').replace(':', '\\:').replace("'", "\\'")
+
+
+def ass_filter(ass_path: str) -> str:
+    """生成 libass 滤镜参数"""
+    fonts_dir = os.path.dirname(FONT_FILE)
+    vf = f"ass={escape_filter_path(ass_path)}"
+    if os.path.isdir(fonts_dir):
+        vf += f":fontsdir={escape_filter_path(fonts_dir)}"
+    return vf
+
+
+def vertical_ass(subs: Subtitles, ass_path: str) -> str:
+    """竖屏版字幕：坐标系为 1080x1920，位置在抖音界面的安全区内"""
+    return srt_to_ass(subs, ass_path, VERTICAL_WIDTH, VERTICAL_HEIGHT, VERTICAL_MARGIN_V, VERTICAL_MARGIN_H)
+
+
+def vertical_graph(mode: str, ass_path: str) -> str:
+    """横屏画面转 1080x1920 竖屏并烧录字幕的滤镜图 (一进一出)"""
+    w, h = VERTICAL_WIDTH, VERTICAL_HEIGHT
+    fill = f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h}"
+    if mode == "crop":
+        graph = fill
+    else:
+        # 背景缩小后模糊再放大，比全分辨率模糊快得多
+        graph = (f"split[vbg][vfg];"
+                 f"[vbg]scale={w // 4}:{h // 4}:force_original_aspect_ratio=increase,crop={w // 4}:{h // 4},"
+                 f"boxblur=10:2,scale={w}:{h}[vblur];"
+                 f"[vfg]scale={w}:{h}:force_original_aspect_ratio=decrease[vsharp];"
+                 f"[vblur][vsharp]overlay=(W-w)/2:(H-h)/2")
+    return f"{graph},setsar=1,{ass_filter(ass_path)}"
+
+
+def report_speed(engine: str, frames: int, elapsed: float):
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    print(f"⏱️ 烧录速度 ({engine}): {frames} 帧 / {elapsed:.1f}s = {fps:.1f} fps")
+    return fps
+
+
+def burn_subtitles_ass(video_path: str, srt_path: "str | Subtitles", output_path: str, audio_path: str = None,
+                       chunks: int = 1, vertical: str = None, vertical_path: str = None):
+    """使用 ffmpeg + libass 烧录字幕（单次原生编码）
+
+    chunks: 大于 1 (或 0 自动选择) 时按关键帧分段并行编码，见 chunked_encode.py
+    vertical: blur / crop 时在同一个滤镜图中同时输出竖屏版到 vertical_path
+    """
+    info = probe_video(video_path)
+    subs = as_subtitles(srt_path)
+    print(f"   共 {len(subs)} 条字幕，视频 {info['width']}x{info['height']} @ {info['fps']:.2f}fps")
+    if chunks <= 0:
+        chunks = auto_chunks(info['duration'])
+    if chunks > 1:
+        return burn_subtitles_chunked(video_path, subs, output_path, audio_path, chunks, info,
+                                      vertical, vertical_path)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        outputs = [output_path]
+        with profiled("srt_to_ass"):
+            graphs = [ass_filter(srt_to_ass(subs, os.path.join(temp_dir, "subtitles.ass"),
+                                            info['width'], info['height']))]
+            if vertical:
+                outputs.append(vertical_path)
+                ass_path = vertical_ass(subs, os.path.join(temp_dir, "vertical.ass"))
+                graphs.append(vertical_graph(vertical, ass_path))
+        report_counts(cues=len(subs), frames=info['frames'])
+
+        print(f"💾 导出视频: {', '.join(outputs)}")
+        start = time.perf_counter()
+        cmd = ["ffmpeg", "-y", "-v", "error", "-stats", "-i", video_path]
+        if audio_path:
+            cmd += ["-i", audio_path]
+        cmd += filter_args(graphs, outputs)
+        for i, path in enumerate(outputs):
+            # 配音在同一次编码中替换原音轨
+            cmd += output_map(i, outputs) + ["-map", "1:a" if audio_path else "0:a?"]
+            cmd += ["-c:v", "libx264", "-preset", "fast", "-crf", "23"]
+            cmd += ["-c:a", "aac", "-b:a", "192k"] if audio_path else ["-c:a", "copy"]
+            cmd.append(path)
+        result = subprocess.run(cmd)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-    print(f"📖 读取字幕: {srt_path}")
-    subs = pysrt.open(srt_path, encoding='utf-8')
+    if result.returncode != 0:
+        raise RuntimeError("ffmpeg libass 烧录失败")
+    report_speed("ass", info['frames'], elapsed)
+    return output_path
+
+
+def burn_subtitles_chunked(video_path: str, subs: Subtitles, output_path: str, audio_path: str,
+                           chunks: int, info: dict, vertical: str = None, vertical_path: str = None):
+    """分段并行烧录：每段写一份只含本段字幕 (时间轴从 0 开始) 的 ASS；竖屏版与横屏版共用每段的解码"""
+    outputs = [output_path, vertical_path] if vertical else [output_path]
+
+    def chunk_filters(index, start_ms, end_ms, work_dir):
+        window = subs.window(start_ms, end_ms)
+        ass_path = os.path.join(work_dir, f"subtitles_{index:03d}.ass")
+        graphs = [ass_filter(srt_to_ass(window, ass_path, info['width'], info['height']))]
+        if vertical:
+            ass_path = os.path.join(work_dir, f"vertical_{index:03d}.ass")
+            graphs.append(vertical_graph(vertical, vertical_ass(window, ass_path)))
+        return graphs
+
+    report_counts(cues=len(subs), frames=info['frames'])
+    print(f"💾 导出视频: {', '.join(outputs)}")
+    result = encode_chunked(video_path, outputs, audio_path, chunks, chunk_filters, info)
+    report_counts(chunks=result['chunks'])
+    report_speed(f"ass ×{result['chunks']}", info['frames'], result['seconds'])
+    return output_path
+
+
+def burn_subtitles_moviepy(video_path: str, srt_path: "str | Subtitles", output_path: str, audio_path: str = None):
+    """使用 moviepy 烧录字幕"""
+    from moviepy import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip
+
+    subs = as_subtitles(srt_path)
     total = len(subs)
     print(f"   共 {total} 条字幕")
 
     print(f"📹 加载视频: {video_path}")
     video = VideoFileClip(video_path)
+    if audio_path:
+        video = video.with_audio(AudioFileClip(audio_path))
 
     # 创建字幕剪辑列表
     subtitle_clips = []
 
-    for i, sub in enumerate(subs, 1):
+    for i, (start_ms, end_ms, text) in enumerate(zip(subs.starts, subs.ends, subs.flat_texts()), 1):
         if i % 10 == 0:
             print(f"   处理字幕 {i}/{total}...")
 
-        start_time = sub.start.ordinal / 1000
-        end_time = sub.end.ordinal / 1000
+        start_time = start_ms / 1000
+        end_time = end_ms / 1000
         duration = end_time - start_time
 
-        text = sub.text.replace('\n', ' ')
-
         try:
             txt_clip = TextClip(
                 text=text,
-                font_size=48,
+                font_size=FONT_SIZE,
                 color='white',
                 stroke_color='black',
-                stroke_width=2,
-                font='/System/Library/Fonts/STHeiti Medium.ttc',
+                stroke_width=STROKE_WIDTH,
+                font=FONT_FILE,
                 method='caption',
-                size=(int(video.w * 0.9), None),
+                size=(int(video.w * TEXT_WIDTH_RATIO), None),
             )
             txt_clip = txt_clip.with_start(start_time).with_duration(duration)
-            txt_clip = txt_clip.with_position(('center', int(video.h - 120)))
+            txt_clip = txt_clip.with_position(('center', int(video.h - BOTTOM_OFFSET)))
             subtitle_clips.append(txt_clip)
         except Exception as e:
             print(f"⚠️ 跳过字幕 {i}: {e}")
@@ -58,29 +260,97 @@ def burn_subtitles(video_path: str, srt_path: str, output_path: str = None):
     final = CompositeVideoClip([video] + subtitle_clips)
 
     print(f"💾 导出视频: {output_path}")
+    start = time.perf_counter()
     final.write_videofile(
         output_path,
         codec='libx264',
         audio_codec='aac',
         fps=video.fps,
         preset='fast',
-        threads=4,
+        threads=available_cores(),
         logger=None
     )
+    elapsed = time.perf_counter() - start
+    frames = int(video.duration * video.fps)
 
     video.close()
     final.close()
 
+    report_speed("moviepy", frames, elapsed)
+    return output_path
+
+
+def burn_subtitles(video_path: str, srt_path: "str | Subtitles", output_path: str = None, engine: str = "ass",
+                   audio_path: str = None, chunks: int = 1, vertical: str = None, vertical_path: str = None):
+    """烧录字幕，libass 引擎失败时自动回退到 moviepy
+
+    srt_path: 字幕路径，或上一步直接传来的 Subtitles (两个引擎共用同一份，不重复解析)
+    audio_path: 配音文件，指定时替换原视频音轨
+    chunks: ass 引擎的分段数，1 表示整段一次编码，0 表示自动
+    vertical: blur / crop 时同时输出竖屏版 (仅 ass 引擎)，默认保存为 <output>_vertical.mp4；
+              竖屏版无法生成时 (libass 失败) 不回退到 moviepy，直接抛出 RuntimeError
+    """
+    if vertical and engine != "ass":
+        raise ValueError("竖屏输出需要 ass 引擎，moviepy 引擎不支持")
+
+    if output_path is None:
+        base, ext = os.path.splitext(video_path)
+        output_path = f"{base}_subtitled{ext}"
+    if vertical and vertical_path is None:
+        base, ext = os.path.splitext(output_path)
+        vertical_path = f"{base}_vertical{ext}"
+    if vertical and os.path.exists(vertical_path):
+        # 上次运行留下的竖屏版不能当作本次的结果
+        os.remove(vertical_path)
+
+    if not isinstance(srt_path, Subtitles):
+        print(f"📖 读取字幕: {srt_path}")
+    subs = as_subtitles(srt_path)
+
+    if engine == "ass":
+        try:
+            burn_subtitles_ass(video_path, subs, output_path, audio_path, chunks, vertical, vertical_path)
+            print(f"✅ 完成: {output_path}")
+            return output_path
+        except Exception as e:
+            if vertical:
+                raise RuntimeError(f"libass 烧录失败，moviepy 不能生成竖屏版: {e}") from e
+            print(f"⚠️ libass 烧录失败，回退到 moviepy: {e}")
+
+    burn_subtitles_moviepy(video_path, subs, output_path, audio_path)
     print(f"✅ 完成: {output_path}")
     return output_path
 
-if __name__ == "__main__":
+
+def main():
+    parser = argparse.ArgumentParser(description='字幕烧录')
+    parser.add_argument('video', help='输入视频')
+    parser.add_argument('srt', help='SRT 字幕')
+    parser.add_argument('output', nargs='?', default=None, help='输出视频 (默认: <video>_subtitled.mp4)')
+    parser.add_argument('--engine', default='ass', choices=['ass', 'moviepy'],
+                        help='烧录引擎: ass (ffmpeg+libass，快) 或 moviepy (备用) (默认: ass)')
+    parser.add_argument('--audio', default=None, help='用此配音替换原视频音轨')
+    parser.add_argument('--vertical', default=None, choices=VERTICAL_MODES,
+                        help='同时输出 1080x1920 竖屏版: blur (模糊背景填充) 或 crop (居中裁剪)')
+    parser.add_argument('--vertical-output', default=None, help='竖屏版输出路径 (默认: <output>_vertical.mp4)')
+    parser.add_argument('--chunks', type=int, default=1,
+                        help='ass 引擎按关键帧分段并行编码的段数，0 表示按时长和核数自动选择 (默认: 1，不分段)')
+
     if len(sys.argv) < 3:
-        print("用法: python burn_subtitles.py <video.mp4> <subtitles.srt> [output.mp4]")
+        print("用法: python burn_subtitles.py <video.mp4> <subtitles.srt> [output.mp4] "
+              "[--engine ass|moviepy] [--audio dub.mp3] [--chunks N] [--vertical blur|crop]")
+        sys.exit(1)
+
+    args = parser.parse_args()
+    if args.vertical and args.engine != 'ass':
+        parser.error('--vertical 需要 --engine ass (moviepy 引擎不能生成竖屏版)')
+    try:
+        burn_subtitles(args.video, args.srt, args.output, args.engine, args.audio, args.chunks,
+                       args.vertical, args.vertical_output)
+    except RuntimeError as e:
+        print(f"❌ {e}")
         sys.exit(1)
 
-    video_path = sys.argv[1]
-    srt_path = sys.argv[2]
-    output_path = sys.argv[3] if len(sys.argv) > 3 else None
 
-    burn_subtitles(video_path, srt_path, output_path)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+常驻 ChatTTS 服务 - 模型和说话人特征常驻内存，接受批量合成请求
+用法: python chattts_server.py [--port 8765] [--seed 42]
+
+启动后 tts_chattts.py (以及 process_free.py --tts chattts) 会自动使用它，
+每个视频不再重新导入 torch、加载 ~1GB 模型。
+
+接口:
+  GET  /health       服务状态
+  POST /refine       {"texts": [...], "seed": 42} -> {"texts": [润色后的文本, ...]}
+  POST /synthesize   {"texts": [...], "seed": 42, "skip_refine": false}
+                     -> npz (arr_0, arr_1, ... 与 texts 一一对应，采样率 24000)
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from tts_chattts import ChatTTSEngine, PROFILES, encode_wavs
+
+
+class ChatTTSHandler(BaseHTTPRequestHandler):
+    engine = None
+    started = time.time()
+    # 模型推理不能并发：/refine 和 /synthesize 排队执行，/health 不等锁，合成期间也能立即响应
+    inference_lock = threading.Lock()
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict):
+        self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json")
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        self._send_json(200, {
+            "status": "ok",
+            "uptime": round(time.time() - self.started),
+            "profile": self.engine.profile,
+            "model_load_seconds": round(self.engine.load_seconds, 1),
+            "speakers": sorted(self.engine.speakers.copy()),
+            "busy": self.inference_lock.locked(),
+        })
+
+    def do_POST(self):
+        if self.path not in ("/refine", "/synthesize"):
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            texts = request["texts"]
+            seed = int(request.get("seed", 42))
+            skip_refine = bool(request.get("skip_refine", False))
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"请求格式错误: {e}"})
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.inference_lock:
+                if self.path == "/refine":
+                    refined = self.engine.refine(texts, seed)
+                else:
+                    wavs = self.engine.infer(texts, seed, skip_refine)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        if self.path == "/refine":
+            print(f"📝 润色 {len(texts)} 条，耗时 {time.perf_counter() - start:.1f}s")
+            self._send_json(200, {"texts": refined})
+            return
+        audio_seconds = sum(len(wav) for wav in wavs) / 24000
+        print(f"🎙️ {len(texts)} 条，音频 {audio_seconds:.1f}s，耗时 {time.perf_counter() - start:.1f}s")
+        self._send(200, encode_wavs(wavs), "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻 ChatTTS 服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口 (默认: 8765)')
+    parser.add_argument('--seed', type=int, nargs='*', default=[42],
+                        help='启动时预先生成的说话人种子 (默认: 42)')
+    parser.add_argument('--profile', default='default', choices=list(PROFILES),
+                        help='推理配置: default / cpu (int8 量化 + 线程调优) / cpu-compile (再加编译缓存) (默认: default)')
+    args = parser.parse_args()
+
+    ChatTTSHandler.engine = ChatTTSEngine(args.profile)
+    for seed in args.seed:
+        ChatTTSHandler.engine.speaker(seed)
+
+    # 每个连接一个线程，推理由 inference_lock 串行化；其他任务的健康检查不会因为合成中而超时
+    server = ThreadingHTTPServer((args.host, args.port), ChatTTSHandler)
+    print(f"✅ ChatTTS 服务已启动: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 服务已停止")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
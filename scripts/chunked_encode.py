@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+分段并行编码 - 长视频按关键帧切成几段，各段同时编码，最后无损拼接
+特点：
+1. 切分点都是源视频的关键帧，每段从关键帧开始解码，段与段之间不重叠、不丢帧
+2. 每段一个 ffmpeg 进程 (线程数 = 核数 / 段数)，可以给每段单独的滤镜 (例如只含本段时间轴的字幕)；
+   多个输出 (横屏 + 竖屏) 共用每段的一次解码
+3. 用 concat 分离器拼接各段 (-c:v copy，不重新编码)，配音只在最后合并一次
+
+用法: python chunked_encode.py <video.mp4> <output.mp4> [--audio dub.mp3] [--chunks N]
+"""
+
+import sys
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from media_probe import probe_video
+
+# 短于这个时长的视频不分段 (分段、拼接本身的开销抵消了并行收益)
+MIN_CHUNK_SECONDS = 60
+# 每段 ffmpeg 至少使用的线程数：libx264 单个编码器在 4 线程以内扩展性最好
+THREADS_PER_CHUNK = 4
+X264_OPTIONS = ["-c:v", "libx264", "-preset", "fast", "-crf", "23"]
+
+
+def available_cores() -> int:
+    """本进程可用的 CPU 核数 (考虑 taskset / 容器限制)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def auto_chunks(duration: float, cores: int = None) -> int:
+    """按时长和核数选择段数：每段至少 MIN_CHUNK_SECONDS 秒，每段 THREADS_PER_CHUNK 个核"""
+    cores = cores or available_cores()
+    return max(1, min(cores // THREADS_PER_CHUNK, int(duration // MIN_CHUNK_SECONDS)))
+
+
+def keyframe_times(video: str, start_time: float = 0.0) -> list:
+    """视频流所有关键帧相对第一帧的时间 (秒)；只读取包头，不解码
+
+    start_time: 容器起始时间 (probe_video 的 start_time)，从包时间戳中减去，与输入 -ss 和字幕时间轴一致
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 读取关键帧失败: {result.stderr.strip()}")
+    times = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts) - start_time)
+    return sorted(times)
+
+
+def plan_chunks(keyframes: list, duration: float, chunks: int) -> list:
+    """把 [0, duration) 按最接近等分点的关键帧切成最多 chunks 段，返回 [(start, end), ...] (秒)"""
+    cuts = [0.0]
+    for i in range(1, chunks):
+        target = duration * i / chunks
+        candidates = [t for t in keyframes if cuts[-1] < t < duration]
+        if not candidates:
+            break
+        cut = min(candidates, key=lambda t: abs(t - target))
+        if cut not in cuts:
+            cuts.append(cut)
+    cuts = sorted(cuts)
+    return list(zip(cuts, cuts[1:] + [duration]))
+
+
+def filter_args(graphs: list, outputs: list) -> list:
+    """每个输出一个滤镜图 (一进一出，可含内部标签) 对应的 ffmpeg 参数；多个输出时共用一次解码，split 后分别处理
+
+    graphs 中为 None 的输出不加滤镜。单个输出时已包含视频流的 -map；
+    多个输出时第 i 个输出需要 -map [v<i>]，见 output_map
+    """
+    if len(outputs) == 1:
+        return (["-vf", graphs[0]] if graphs[0] else []) + ["-map", "0:v:0"]
+    labels = [f"v{i}" for i in range(len(outputs))]
+    parts = [f"[0:v:0]split={len(outputs)}" + "".join(f"[{label}in]" for label in labels)]
+    for label, graph in zip(labels, graphs):
+        parts.append(f"[{label}in]{graph or 'null'}[{label}]")
+    return ["-filter_complex", ";".join(parts)]
+
+
+def output_map(index: int, outputs: list) -> list:
+    """多个输出时第 index 个输出的视频流 -map (单个输出已在 filter_args 中映射)"""
+    return ["-map", f"[v{index}]"] if len(outputs) > 1 else []
+
+
+def encode_chunk(video: str, start: float, end: float, outputs: list, threads: int, graphs: list):
+    """编码 [start, end) 一段视频 (不含音轨)，每个输出用各自的滤镜图；start 是关键帧，从这里开始解码不会多出或缺少画面
+
+    end 为 None 时编码到视频结尾
+    """
+    cmd = ["ffmpeg", "-y", "-v", "error", "-ss", f"{start:.6f}", "-i", video]
+    if end is not None:
+        cmd += ["-t", f"{end - start:.6f}"]
+    cmd += filter_args(graphs, outputs)
+    for i, output in enumerate(outputs):
+        cmd += [*output_map(i, outputs), "-an", *X264_OPTIONS, "-threads", str(threads), output]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"分段编码失败 ({start:.1f}s-{'结尾' if end is None else f'{end:.1f}s'}): {result.stderr.strip()}")
+    return outputs
+
+
+def concat_and_mux(parts: list, video: str, output: str, audio: str = None, work_dir: str = None):
+    """用 concat 分离器无损拼接各段，并合并音轨：audio 指定时用配音 (AAC)，否则复制原视频的音轨"""
+    list_file = os.path.join(work_dir or os.path.dirname(parts[0]), f"{os.path.basename(parts[0])}.txt")
+    with open(list_file, "w", encoding="utf-8") as f:
+        for part in parts:
+            escaped = part.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_file]
+    if audio:
+        cmd += ["-i", audio, "-map", "0:v", "-map", "1:a", "-c:v", "copy", "-c:a", "aac", "-b:a", "192k"]
+    else:
+        cmd += ["-i", video, "-map", "0:v", "-map", "1:a?", "-c:v", "copy", "-c:a", "copy"]
+    cmd.append(output)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"拼接分段失败: {result.stderr.strip()}")
+    return output
+
+
+def encode_chunked(video: str, output: "str | list", audio: str = None, chunks: int = 0, chunk_filters=None,
+                   info: dict = None) -> dict:
+    """分段并行编码整段视频，返回 {"chunks", "seconds"}
+
+    output: 输出文件；也可以是多个输出 (例如横屏 + 竖屏)，每段只解码一次，分别编码
+    audio: 配音文件，指定时替换原音轨，否则保留原音轨
+    chunks: 段数，0 表示按时长和核数自动选择 (auto_chunks)；实际段数受关键帧数量限制
+    chunk_filters: 可选，chunk_filters(index, start_ms, end_ms, work_dir) 返回该段每个输出的滤镜图列表
+                   (时间轴从 0 开始)，例如只含本段字幕的 ass 滤镜
+    """
+    outputs = [output] if isinstance(output, str) else list(output)
+    info = info or probe_video(video)
+    duration = info["duration"]
+    if duration <= 0:
+        # ffprobe 没有给出时长：无法规划切分点，整段一次编码
+        print("⚠️ 无法获取视频时长，不分段")
+        ranges = [(0.0, None)]
+    else:
+        if chunks <= 0:
+            chunks = auto_chunks(duration)
+        keyframes = keyframe_times(video, info.get("start_time", 0.0)) if chunks > 1 else []
+        ranges = plan_chunks(keyframes, duration, chunks)
+    threads = max(1, available_cores() // len(ranges))
+    print(f"🧩 分 {len(ranges)} 段并行编码 (每段 {threads} 线程，{len(outputs)} 个输出)")
+
+    work_dir = tempfile.mkdtemp(prefix="chunks-")
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = []
+            for i, (chunk_start, chunk_end) in enumerate(ranges):
+                end_ms = int(chunk_end * 1000) if chunk_end is not None else 2 ** 31 - 1
+                graphs = chunk_filters(i, int(chunk_start * 1000), end_ms, work_dir) \
+                    if chunk_filters else [None] * len(outputs)
+                parts = [os.path.join(work_dir, f"out{j}_part_{i:03d}.mp4") for j in range(len(outputs))]
+                futures.append(pool.submit(encode_chunk, video, chunk_start, chunk_end, parts, threads, graphs))
+            chunk_parts = [future.result() for future in futures]
+        for j, path in enumerate(outputs):
+            concat_and_mux([parts[j] for parts in chunk_parts], video, path, audio, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"chunks": len(ranges), "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分段并行编码')
+    parser.add_argument('video', help='输入视频')
+    parser.add_argument('output', help='输出视频')
+    parser.add_argument('--audio', default=None, help='用此配音替换原视频音轨')
+    parser.add_argument('--chunks', type=int, default=0, help='段数，0 表示自动 (默认: 0)')
+
+    if len(sys.argv) < 3:
+        print("用法: python chunked_encode.py <video.mp4> <output.mp4> [--audio dub.mp3] [--chunks N]")
+        sys.exit(1)
+
+    args = parser.parse_args()
+    try:
+        result = encode_chunked(args.video, args.output, args.audio, args.chunks)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ 完成: {args.output} ({result['chunks']} 段，{result['seconds']:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
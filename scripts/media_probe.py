@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+媒体信息探测 - 使用 ffprobe 读取视频流参数
+用法: python media_probe.py <video.mp4>
+"""
+
+import sys
+import json
+import subprocess
+
+# 抖音可直接接收的视频流: 8 位 4:2:0 的 H.264 (High 10 / 4:2:2 等 profile 需要重新编码)
+COPYABLE_CODECS = {"h264"}
+COPYABLE_PIX_FMTS = {"yuv420p", "yuvj420p"}
+
+
+def probe_video(path: str) -> dict:
+    """返回第一个视频流的信息: codec / width / height / fps / duration / frames / pix_fmt / start_time
+
+    start_time: 容器的起始时间 (秒)，数据包时间戳减去它才是相对第一帧的时间 (输入 -ss 使用的时间)
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=codec_name,profile,pix_fmt,width,height,avg_frame_rate,nb_frames,duration"
+         ":format=duration,start_time",
+         "-of", "json", path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe 失败: {result.stderr.strip()}")
+
+    data = json.loads(result.stdout)
+    if not data.get("streams"):
+        raise RuntimeError(f"没有视频流: {path}")
+    stream = data["streams"][0]
+
+    num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+    fps = float(num) / float(den) if den and float(den) else 0.0
+    duration = float(stream.get("duration") or data.get("format", {}).get("duration") or 0)
+    frames = int(stream["nb_frames"]) if stream.get("nb_frames", "").isdigit() else int(duration * fps)
+
+    return {
+        "codec": stream.get("codec_name"),
+        "profile": stream.get("profile"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": fps,
+        "duration": duration,
+        "frames": frames,
+        "start_time": float(data.get("format", {}).get("start_time") or 0),
+    }
+
+
+def is_copyable(info: dict) -> bool:
+    """视频流不用重新编码就能发布到抖音时返回 True，此时合并配音可以直接复制视频流"""
+    return info["codec"] in COPYABLE_CODECS and info["pix_fmt"] in COPYABLE_PIX_FMTS
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python media_probe.py <video.mp4>")
+        sys.exit(1)
+
+    info = probe_video(sys.argv[1])
+    for key, value in info.items():
+        print(f"{key}: {value}")
+    print(f"copyable: {is_copyable(info)}")
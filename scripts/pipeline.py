@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+流水线库接口 - 在本进程内依次调用各步骤，字幕以 Subtitles 对象在步骤之间直接传递
+特点：
+1. translate(subs) / synthesize(subs) / mux() / burn()，不再为每个步骤启动一个 Python 子进程
+2. 各后端模块 (deep_translator、edge_tts、ChatTTS/torch、moviepy) 只在选中时才导入
+3. 第一次导入后端的耗时计入当前步骤的 import 时间 (stage_metrics.import_backend)
+
+用法: python pipeline.py <video.mp4> <english.srt> <output_dir> [--tts edge|chattts]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from stage_metrics import profiled, import_backend
+from subtitle_store import Subtitles, as_subtitles
+
+
+def translate(subs: "str | Subtitles", output_srt: str = None, cache: bool = True,
+              workers: int = 4, rps: float = 3.0, **options) -> Subtitles:
+    """翻译为中文，返回译文 Subtitles；指定 output_srt 时同时写出文件
+
+    cache: 是否使用翻译记忆 (~/douyin-video-tool/cache/translation_memory.db)
+    options: 其余参数原样传给 translate_google_v2.translate_subtitles (retries / pack_chars 等)
+    """
+    translator = import_backend("translate_google_v2")
+    memory = import_backend("translation_memory").TranslationMemory() if cache else None
+    try:
+        with profiled("translate"):
+            zh_subs = translator.translate_subtitles(as_subtitles(subs), None, memory,
+                                                     workers=workers, rps=rps, **options)
+    finally:
+        if memory is not None:
+            memory.close()
+    if output_srt:
+        zh_subs.save(output_srt)
+        print(f"📁 保存到: {output_srt}")
+    return zh_subs
+
+
+def synthesize(subs: "str | Subtitles", output_audio: str, engine: str = "edge", voice: str = "yunxi",
+               cache_dir: str = None, seed: int = 42, profile: str = "default", workers: int = 1,
+               skip_refine: bool = False) -> str:
+    """生成配音，返回音频路径
+
+    engine: edge (Edge TTS，只导入 edge_tts) 或 chattts (只在这里导入 ChatTTS / torch)
+    voice / cache_dir: Edge TTS 的声音和片段缓存目录
+    seed / profile / workers / skip_refine: ChatTTS 参数，含义同 tts_chattts.generate_tts
+    """
+    subs = as_subtitles(subs)
+    if engine == "chattts":
+        tts = import_backend("tts_chattts")
+        cache = None if skip_refine else import_backend("refine_cache").RefineCache(tts.DEFAULT_REFINE_DB)
+        try:
+            with profiled("tts"):
+                return tts.generate_tts(subs, output_audio, seed, profile=profile, workers=workers,
+                                        skip_refine=skip_refine, refine_cache=cache)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    tts = import_backend("tts_free")
+    segment_cache = import_backend("segment_cache")
+    cache = segment_cache.SegmentCache(cache_dir or segment_cache.DEFAULT_CACHE_DIR)
+    with profiled("tts"):
+        return asyncio.run(tts.generate_tts(subs, output_audio, voice, cache=cache))
+
+
+def can_copy_video(video: str) -> bool:
+    """视频流已经是抖音兼容的 H.264 时返回 True；无法探测 (例如没有 ffprobe) 时按需要重新编码处理"""
+    media_probe = import_backend("media_probe")
+    try:
+        return media_probe.is_copyable(media_probe.probe_video(video))
+    except (RuntimeError, OSError, ValueError, KeyError) as e:
+        print(f"⚠️ 无法探测视频编码，重新编码: {e}")
+        return False
+
+
+def mux_command(video: str, audio: str, output: str, copy_video: bool = False) -> list:
+    """合并视频轨和配音的 ffmpeg 命令；copy_video 时直接复制视频流，不重新编码"""
+    video_codec = ["-c:v", "copy"] if copy_video else ["-c:v", "libx264", "-preset", "fast", "-crf", "23"]
+    return [
+        "ffmpeg", "-y",
+        "-i", video,
+        "-i", audio,
+        "-map", "0:v", "-map", "1:a",
+        *video_codec,
+        "-c:a", "aac", "-b:a", "192k",
+        output,
+    ]
+
+
+def mux(video: str, audio: str, output: str, copy_video: bool = None, chunks: int = 0) -> str:
+    """用配音替换视频音轨；copy_video 为 None 时视频流兼容就直接复制，否则重新编码
+
+    chunks: 重新编码时按关键帧分段并行编码的段数，0 表示自动，1 表示整段一次编码
+    """
+    if copy_video is None:
+        copy_video = can_copy_video(video)
+    if not copy_video and chunks != 1:
+        import_backend("chunked_encode").encode_chunked(video, output, audio, chunks)
+        return output
+    if subprocess.run(mux_command(video, audio, output, copy_video)).returncode != 0:
+        raise RuntimeError("ffmpeg 合并视频失败")
+    return output
+
+
+def burn(video: str, subs: "str | Subtitles", output: str, engine: str = "ass", audio: str = None,
+         chunks: int = 0, vertical: str = None, vertical_output: str = None) -> str:
+    """烧录字幕 (moviepy 只在回退到 moviepy 引擎时才导入)；audio 指定时同一次编码中替换音轨
+
+    chunks: ass 引擎分段并行编码的段数，0 表示自动，1 表示整段一次编码
+    vertical: blur / crop 时同一个滤镜图中同时输出 1080x1920 竖屏版到 vertical_output
+    """
+    return import_backend("burn_subtitles").burn_subtitles(video, subs, output, engine, audio, chunks,
+                                                           vertical, vertical_output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本进程内运行 翻译 → 配音 → 合并 → 烧录')
+    parser.add_argument('video', help='原视频')
+    parser.add_argument('srt', help='英文 SRT / VTT 字幕')
+    parser.add_argument('output_dir', help='输出目录')
+    parser.add_argument('--tts', default='edge', choices=['edge', 'chattts'], help='TTS 引擎 (默认: edge)')
+    parser.add_argument('--voice', default='yunxi', help='Edge TTS 声音 (默认: yunxi)')
+    parser.add_argument('--seed', type=int, default=42, help='ChatTTS 说话人种子 (默认: 42)')
+
+    if len(sys.argv) < 4:
+        print("用法: python pipeline.py <video.mp4> <english.srt> <output_dir> [--tts edge|chattts]")
+        sys.exit(1)
+
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    base = os.path.join(args.output_dir, os.path.splitext(os.path.basename(args.video))[0])
+
+    start = time.perf_counter()
+    zh_subs = translate(args.srt, f"{base}_zh.srt")
+    audio = synthesize(zh_subs, f"{base}_zh.mp3", args.tts, voice=args.voice, seed=args.seed)
+    mux(args.video, audio, f"{base}_final.mp4")
+    burn(args.video, zh_subs, f"{base}_with_subs.mp4", audio=audio)
+    print(f"✅ 完成，总耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
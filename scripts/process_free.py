@@ -10,17 +10,33 @@
 4. 合并为最终视频（中文配音 + 中文字幕）
 
 无需任何 API key！
+批量处理播放列表/频道请使用 batch.py
 """
 
 import sys
 import os
+import time
 import subprocess
 import glob
 import argparse
+import json
+import shutil
+import tempfile
+import signal
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from stage_cache import StageManifest
+from stage_metrics import (
+    METRICS_ENV, PROFILE_ENV, MetricsLog, run_measured, measure_call, read_counts, path_bytes, print_table,
+)
+import pipeline
+from workspace import (
+    PROJECT_DIR, DOWNLOAD_DIR,
+    extract_video_id, job_dir, staging_dir, video_lock, load_index, publish_download, store_object,
+)
 
 # 项目目录
-PROJECT_DIR = os.path.expanduser("~/douyin-video-tool")
-DOWNLOAD_DIR = os.path.join(PROJECT_DIR, "downloads")
 OUTPUT_DIR = os.path.join(PROJECT_DIR, "output")
 SCRIPTS_DIR = os.path.join(PROJECT_DIR, "scripts")
 VENV_PYTHON = os.path.join(PROJECT_DIR, "venv/bin/python")
@@ -28,135 +44,613 @@ VENV_PYTHON = os.path.join(PROJECT_DIR, "venv/bin/python")
 # Edge TTS 可用声音
 EDGE_VOICES = ["xiaoxiao", "xiaoyi", "yunjian", "yunxi", "yunxia", "yunyang"]
 
-def run_command(cmd, description):
-    """执行命令并打印状态"""
+# yt-dlp 同时下载的分片数
+DEFAULT_FRAGMENTS = 4
+
+# yt-dlp 格式选择：BEST_FORMAT 取画质最高的 mp4 (常是 AV1/VP9，必须重新编码)；
+# H264_FORMAT 优先 H.264 (avc1)，合并配音时可以直接复制视频流
+BEST_FORMAT = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
+H264_FORMAT = ("bestvideo[ext=mp4][vcodec^=avc1]+bestaudio[ext=m4a]/best[ext=mp4][vcodec^=avc1]/"
+               + BEST_FORMAT)
+
+# 步骤类型：network 主要等网络 (下载/在线翻译/Edge TTS)，cpu 主要占 CPU (本地 TTS/编码/烧录)
+NETWORK = "network"
+CPU = "cpu"
+
+def run_command(cmd, description, timings=None, metrics=None, stage=None, inputs=(), outputs=(),
+                profile_dir=None, on_start=None):
+    """执行命令并打印状态和耗时
+
+    cmd: 命令 (子进程运行)，或无参数的函数 (在本进程内调用，见 pipeline.py)
+    metrics: 可选的 MetricsLog，记录墙钟/CPU 时间、峰值内存、读写字节数和子脚本上报的条目数
+    inputs / outputs: 步骤读写的文件或目录，用于统计字节数
+    profile_dir: 设置后子脚本的内层循环用 cProfile 分析，结果存到这个目录
+    on_start: 子进程命令启动后以 Popen 对象调用 (命令在独立的进程组中运行)，见 DownloadHandle
+    """
     print(f"\n{'='*50}")
     print(f"🔹 {description}")
     print(f"{'='*50}")
-    result = subprocess.run(cmd, shell=isinstance(cmd, str))
-    if result.returncode != 0:
+    bytes_in = path_bytes(inputs)
+
+    start = time.perf_counter()
+    if callable(cmd):
+        error, usage, counts = measure_call(cmd, profile_dir)
+        returncode = 0 if error is None else 1
+        if error is not None and not isinstance(error, SystemExit):
+            print(f"⚠️ {type(error).__name__}: {error}")
+    else:
+        fd, counts_path = tempfile.mkstemp(prefix="stage-counts-", suffix=".jsonl")
+        os.close(fd)
+        env = {**os.environ, METRICS_ENV: counts_path}
+        if profile_dir:
+            env[PROFILE_ENV] = profile_dir
+        returncode, usage = run_measured(cmd, env, on_start)
+        counts = read_counts(counts_path)
+        os.remove(counts_path)
+    elapsed = time.perf_counter() - start
+    if timings is not None:
+        timings.append((description, elapsed))
+    if metrics is not None:
+        metrics.add({
+            "stage": stage or description,
+            "description": description,
+            "ok": returncode == 0,
+            "wall": round(elapsed, 2),
+            **usage,
+            "bytes_in": bytes_in,
+            "bytes_out": path_bytes(outputs),
+            "counts": counts,
+        })
+    if returncode != 0:
         print(f"❌ 失败: {description}")
         sys.exit(1)
-    return result
+    imported = f"，导入 {usage['import']:.2f}s" if usage.get("import") else ""
+    print(f"⏱️ {description}: {elapsed:.1f}s (CPU {usage['user'] + usage['sys']:.1f}s，"
+          f"峰值内存 {usage['max_rss_mb']:.0f}MB{imported})")
+    return subprocess.CompletedProcess(cmd, returncode)
 
-def find_latest_file(directory, pattern):
-    """找到目录中最新的匹配文件"""
-    files = glob.glob(os.path.join(directory, pattern))
-    if not files:
-        return None
-    return max(files, key=os.path.getmtime)
+class StageRunner:
+    """单个视频的步骤执行器：记录耗时、按清单复用步骤、按步骤类型限制并发
 
-def main():
-    parser = argparse.ArgumentParser(description='抖音科普视频一键处理工具 (完全免费版)')
-    parser.add_argument('url', help='YouTube视频URL')
-    parser.add_argument('--tts', default='edge', choices=['edge', 'chattts'],
-                        help='TTS引擎: edge (快速，需联网) 或 chattts (高质量，需下载模型) (默认: edge)')
-    parser.add_argument('--voice', default='yunxi',
-                        help='Edge TTS声音: xiaoxiao/xiaoyi/yunjian/yunxi/yunxia/yunyang (默认: yunxi)')
-    parser.add_argument('--seed', type=int, default=42,
-                        help='ChatTTS 说话人种子，不同数字产生不同声音 (默认: 42)')
-    parser.add_argument('--skip-download', action='store_true', help='跳过下载步骤')
-    parser.add_argument('--browser', default='chrome', choices=['chrome', 'safari', 'firefox', 'edge'],
-                        help='用于获取cookies的浏览器 (默认: chrome)')
-    args = parser.parse_args()
+    gate: 可选，gate(kind) 返回该类步骤的并发闸门 (上下文管理器)，批量模式下使用
+    profile_dir: 可选，设置后各步骤的内层循环用 cProfile 分析
+    """
 
-    # 确保目录存在
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    def __init__(self, manifest=None, force=False, gate=None, label="", profile_dir=None):
+        self.manifest = manifest
+        self.force = force
+        self.gate = gate
+        self.label = label
+        self.profile_dir = profile_dir
+        self.timings = []  # [(description, seconds), ...]
+        self.reused = []   # 通过清单复用、没有重跑的步骤
+        self.metrics = MetricsLog()  # 工作区确定后由 process_video 指定 metrics.jsonl
+
+    def command(self, cmd, description, kind=CPU, stage=None, inputs=(), outputs=(), on_start=None):
+        """执行一个不参与复用的步骤"""
+        description = f"{self.label}{description}"
+        with self.gate(kind) if self.gate else nullcontext():
+            return run_command(cmd, description, self.timings, self.metrics, stage or description,
+                               inputs, outputs, self.profile_dir, on_start)
+
+    def stage(self, stage, cmd, description, inputs, params, outputs, kind=CPU):
+        """执行一个可复用的步骤：清单显示输入/参数/输出都没变时跳过"""
+        if not self.force and self.manifest.is_fresh(stage, inputs, params, outputs):
+            print(f"\n♻️ 复用: {self.label}{description}（输入和参数均未变化）")
+            self.reused.append(stage)
+            self.metrics.add({"stage": stage, "description": description, "reused": True})
+            return
+        self.command(cmd, description, kind, stage, list(inputs.values()), outputs)
+        self.manifest.record(stage, inputs, params, outputs)
 
-    # Step 1: 下载视频
-    if not args.skip_download:
-        run_command(
-            f"yt-dlp --cookies-from-browser {args.browser} "
-            f"--format 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best' "
-            f"--merge-output-format mp4 --write-sub --write-auto-sub "
-            f"--sub-lang 'en,en-US,en-GB' --sub-format 'srt/vtt/best' --convert-subs srt "
-            f"--output '{DOWNLOAD_DIR}/%(title)s.%(ext)s' --restrict-filenames --no-playlist "
-            f"'{args.url}'",
-            "下载视频和字幕"
-        )
-
-    # 查找下载的文件
-    video_file = find_latest_file(DOWNLOAD_DIR, "*.mp4")
-    srt_file = find_latest_file(DOWNLOAD_DIR, "*.srt")
-
-    if not video_file:
+    def print_summary(self):
+        """打印各步骤耗时、CPU、内存和读写量汇总"""
+        print(f"\n⏱️ 各步骤统计:")
+        print_table(self.metrics.records)
+        if self.metrics.path:
+            print(f"📁 详细记录: {self.metrics.path}")
+
+def download_command(url, browser, download_dir, paths_file, fragments=DEFAULT_FRAGMENTS,
+                     video_format=H264_FORMAT):
+    """yt-dlp 下载视频和英文字幕的命令，完成后把视频 ID 和实际文件路径写入 paths_file"""
+    return (
+        f"yt-dlp --cookies-from-browser {browser} "
+        f"--format '{video_format}' "
+        f"--merge-output-format mp4 --write-sub --write-auto-sub "
+        f"--sub-lang 'en,en-US,en-GB' --sub-format 'srt/vtt/best' --convert-subs srt "
+        f"--concurrent-fragments {fragments} "
+        f"--output '{download_dir}/%(title)s.%(ext)s' --restrict-filenames --no-playlist "
+        f"--print-to-file 'after_move:%(id)s' '{paths_file}' "
+        f"--print-to-file 'after_move:%(filepath)s' '{paths_file}' "
+        f"--print-to-file 'after_move:%(requested_subtitles)j' '{paths_file}' "
+        f"'{url}'"
+    )
+
+def subtitle_command(url, browser, download_dir, paths_file):
+    """只下载英文字幕 (不下载视频) 的命令，把视频 ID 和按标题生成的文件名写入 paths_file"""
+    return (
+        f"yt-dlp --cookies-from-browser {browser} --skip-download "
+        f"--write-sub --write-auto-sub "
+        f"--sub-lang 'en,en-US,en-GB' --sub-format 'srt/vtt/best' --convert-subs srt "
+        f"--output '{download_dir}/%(title)s.%(ext)s' --restrict-filenames --no-playlist "
+        f"--print-to-file 'video:%(id)s' '{paths_file}' "
+        f"--print-to-file 'video:%(filename)s' '{paths_file}' "
+        f"'{url}'"
+    )
+
+def video_command(url, browser, download_dir, paths_file, fragments=DEFAULT_FRAGMENTS, video_format=H264_FORMAT):
+    """只下载视频 (字幕已经单独下载) 的命令，分片并发下载"""
+    return (
+        f"yt-dlp --cookies-from-browser {browser} "
+        f"--format '{video_format}' "
+        f"--merge-output-format mp4 --concurrent-fragments {fragments} "
+        f"--output '{download_dir}/%(title)s.%(ext)s' --restrict-filenames --no-playlist "
+        f"--print-to-file 'after_move:%(id)s' '{paths_file}' "
+        f"--print-to-file 'after_move:%(filepath)s' '{paths_file}' "
+        f"'{url}'"
+    )
+
+def read_download_paths(paths_file, download_dir):
+    """解析 yt-dlp 写出的视频 ID 和实际文件路径，返回 (video_id, video_file, srt_file)"""
+    if not os.path.exists(paths_file):
         print("❌ 未找到视频文件")
         sys.exit(1)
+    with open(paths_file, encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    video_id, video_file = lines[0], lines[1]
 
-    if not srt_file:
-        print("⚠️ 未找到字幕文件，请手动添加或使用Whisper生成")
-        sys.exit(1)
+    try:
+        subtitles = json.loads(lines[2]) or {}
+    except (IndexError, ValueError):
+        subtitles = {}
+    srt_file = None
+    for lang in ['en', 'en-US', 'en-GB', *subtitles]:
+        path = (subtitles.get(lang) or {}).get('filepath')
+        if path and path.endswith('.srt') and os.path.exists(path):
+            srt_file = path
+            break
+    if srt_file is None:
+        # 旧版 yt-dlp 不回写转换后的字幕路径
+        srt_file = find_subtitle_file(download_dir)
+    return video_id, video_file, srt_file
+
+def find_subtitle_file(download_dir):
+    """下载目录是本任务独占的，其中的 srt 就是这个视频的；没有转换成 srt 时退回 vtt (subtitle_store 可直接解析)"""
+    for ext in ("srt", "vtt"):
+        candidates = sorted(glob.glob(os.path.join(download_dir, f"*.{ext}")))
+        if candidates:
+            return candidates[0]
+    return None
+
+def download_video(url, browser, runner, fragments=DEFAULT_FRAGMENTS, video_format=H264_FORMAT):
+    """下载到临时目录，再存入按内容寻址的下载存储"""
+    download_dir = staging_dir()
+    paths_file = os.path.join(download_dir, "paths.txt")
+    try:
+        runner.command(download_command(url, browser, download_dir, paths_file, fragments, video_format),
+                       "下载视频和字幕",
+                       NETWORK, stage="download", outputs=[download_dir])
+        video_id, video_file, srt_file = read_download_paths(paths_file, download_dir)
+        if not srt_file:
+            print("⚠️ 未找到字幕文件，请手动添加或使用Whisper生成")
+            sys.exit(1)
+        title = os.path.splitext(os.path.basename(video_file))[0]
+        return publish_download(video_id, title, video_file, srt_file)
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+class DownloadHandle:
+    """后台下载的 yt-dlp 进程组；流水线失败退出时用 stop() 终止它 (守护线程退出时子进程不会跟着退出)"""
+
+    def __init__(self):
+        self.proc = None
+        self.stopped = False
+        self._lock = threading.Lock()
+
+    def started(self, proc):
+        with self._lock:
+            self.proc = proc
+            if self.stopped:
+                self._signal(signal.SIGTERM)
+
+    def _signal(self, sig):
+        if self.proc is not None and self.proc.returncode is None:
+            try:
+                os.killpg(self.proc.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, future, timeout=10):
+        """终止下载进程组并等待后台线程结束 (它会清理临时下载目录)"""
+        with self._lock:
+            self.stopped = True
+            self._signal(signal.SIGTERM)
+        try:
+            future.exception(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._signal(signal.SIGKILL)
+            future.exception(timeout=timeout)
+
+def run_in_background(fn, *args, name=None):
+    """在守护线程中运行 fn，返回 Future
+
+    不用 ThreadPoolExecutor：它的线程在解释器退出时会被等待，翻译或配音失败 (sys.exit) 后
+    还要等整个视频下载完才能退出
+    """
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return future
+
+def download_subtitles_first(url, browser, runner, fragments=DEFAULT_FRAGMENTS, video_format=H264_FORMAT):
+    """先只下载字幕，视频在后台线程中下载
+
+    返回 {"id", "title", "video", "srt"}，其中 "video" 是 Future，
+    翻译和配音可以马上开始，到合并步骤才需要等视频下载完成
+    """
+    download_dir = staging_dir()
+    paths_file = os.path.join(download_dir, "paths.txt")
+    try:
+        runner.command(subtitle_command(url, browser, download_dir, paths_file), "下载英文字幕", NETWORK,
+                       stage="subtitles", outputs=[download_dir])
+        if not os.path.exists(paths_file):
+            print("❌ 无法获取视频信息")
+            sys.exit(1)
+        with open(paths_file, encoding='utf-8') as f:
+            video_id, filename = [line.strip() for line in f if line.strip()][:2]
+        srt_file = find_subtitle_file(download_dir)
+        if not srt_file:
+            print("⚠️ 未找到字幕文件，请手动添加或使用Whisper生成")
+            sys.exit(1)
+        srt_file = store_object(srt_file)
+    finally:
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+    title = os.path.splitext(os.path.basename(filename))[0]
+    handle = DownloadHandle()
+    video = run_in_background(download_video_only, url, browser, runner, video_id, title, srt_file, fragments,
+                              video_format, handle, name=f"download-{video_id}")
+    video.download = handle
+    print(f"\n⏬ 视频在后台下载，先开始翻译和配音: {runner.label}{title}")
+    return {"id": video_id, "title": title, "video": video, "srt": srt_file}
 
-    print(f"\n📁 视频文件: {video_file}")
-    print(f"📁 字幕文件: {srt_file}")
+def download_video_only(url, browser, runner, video_id, title, srt_file, fragments=DEFAULT_FRAGMENTS,
+                        video_format=H264_FORMAT, handle=None):
+    """后台下载视频并和已下载的字幕一起记入下载存储，返回视频路径
+
+    handle: 可选的 DownloadHandle，记录 yt-dlp 进程以便流水线失败时终止
+    """
+    with video_lock(video_id):
+        entry = load_index(video_id)
+        if entry:
+            # 其他任务已经下载了同一个视频
+            return entry['video']
+        download_dir = staging_dir()
+        paths_file = os.path.join(download_dir, "paths.txt")
+        try:
+            runner.command(video_command(url, browser, download_dir, paths_file, fragments, video_format),
+                           "下载视频", NETWORK, stage="download", outputs=[download_dir],
+                           on_start=handle.started if handle else None)
+            _, video_file, _ = read_download_paths(paths_file, download_dir)
+            return publish_download(video_id, title, video_file, srt_file)['video']
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+def fetch_video(url, browser, runner, skip_download=False, video_id=None, overlap=True,
+                fragments=DEFAULT_FRAGMENTS, video_format=H264_FORMAT):
+    """取得视频和英文字幕，返回 {"id", "title", "video", "srt"}
+
+    同一视频已经下载过（本任务或其他任务）时直接复用，不再下载
+    overlap: 先下载字幕，视频在后台下载，此时 "video" 是 Future (见 download_subtitles_first)
+    video_format: yt-dlp 格式选择，见 H264_FORMAT / BEST_FORMAT
+    """
+    download = download_subtitles_first if overlap else download_video
+    video_id = video_id or extract_video_id(url)
+    if video_id is None:
+        if skip_download:
+            print(f"❌ 无法从链接解析视频 ID，不能跳过下载: {url}")
+            sys.exit(1)
+        return download(url, browser, runner, fragments, video_format)
+
+    with video_lock(video_id):
+        entry = load_index(video_id)
+        if entry:
+            print(f"\n♻️ 复用已下载的视频: {runner.label}{entry['title']}")
+            return entry
+        if skip_download:
+            print(f"❌ 视频 {video_id} 还没有下载过")
+            sys.exit(1)
+        if not overlap:
+            return download_video(url, browser, runner, fragments, video_format)
+    # 后台下载线程会重新加锁，并再检查一次是否已被其他任务下载
+    return download_subtitles_first(url, browser, runner, fragments, video_format)
+
+def process_video(args, runner, video_file, srt_file, work_dir, base_name):
+    """翻译 → 配音 → 合并 → 烧录，返回输出文件 {"video", "video_with_subs", "vertical", "srt"}
+
+    video_file: 视频路径，或仍在后台下载的 Future (合并步骤前才等待)
+    work_dir: 本视频的工作区，存放中间文件 (中文字幕、配音、步骤清单)
+    base_name: 输出文件名前缀
+    """
+    try:
+        return run_stages(args, runner, video_file, srt_file, work_dir, base_name)
+    except BaseException:
+        # 翻译或配音失败 (包括 sys.exit / Ctrl+C) 时终止后台下载，不留下 yt-dlp 进程和临时下载目录
+        download = getattr(video_file, "download", None)
+        if download is not None and not video_file.done():
+            print(f"\n🛑 终止后台视频下载: {runner.label}{base_name}")
+            download.stop(video_file)
+        raise
+
+def run_stages(args, runner, video_file, srt_file, work_dir, base_name):
+    """process_video 的各个步骤"""
+    if runner.manifest is None:
+        # 每个视频一个步骤清单，只重跑输入或参数有变化的步骤
+        runner.manifest = StageManifest(os.path.join(work_dir, "manifest.json"))
+    if runner.metrics.path is None:
+        runner.metrics.set_path(os.path.join(work_dir, "metrics.jsonl"))
+    if args.profile_stages and runner.profile_dir is None:
+        runner.profile_dir = os.path.join(work_dir, "profiles")
+
+    # 默认在本进程内调用 pipeline.py；--subprocess-stages 时每个步骤一个 Python 子进程
+    in_process = not args.subprocess_stages
+    translated = {}  # 本进程内运行时，译文 Subtitles 直接交给配音和烧录，不再重新解析
 
     # Step 2: 翻译字幕 (使用 Google Translate V2 - 上下文感知翻译)
-    base_name = os.path.splitext(os.path.basename(video_file))[0]
-    chinese_srt = os.path.join(DOWNLOAD_DIR, f"{base_name}_zh.srt")
+    chinese_srt = os.path.join(work_dir, f"{base_name}_zh.srt")
+    translate_script = os.path.join(SCRIPTS_DIR, "translate_google_v2.py")
+
+    def translate_stage():
+        translated["subs"] = pipeline.translate(srt_file, chinese_srt, workers=args.translate_workers,
+                                                rps=args.translate_rps)
+
+    def chinese_subs():
+        # 翻译步骤被复用时没有内存中的译文，从文件读取
+        return translated.get("subs") or chinese_srt
+
+    if in_process:
+        translate_cmd = translate_stage
+    else:
+        translate_cmd = [VENV_PYTHON, translate_script, srt_file, chinese_srt,
+                         "--workers", str(args.translate_workers), "--rps", str(args.translate_rps)]
 
-    run_command(
-        [VENV_PYTHON, os.path.join(SCRIPTS_DIR, "translate_google_v2.py"), srt_file, chinese_srt],
-        "翻译字幕为中文 (Google Translate - 上下文感知)"
+    runner.stage(
+        "translate",
+        translate_cmd,
+        "翻译字幕为中文 (Google Translate - 上下文感知)",
+        inputs={"srt": srt_file, "script": translate_script},
+        params={"engine": "google", "target": "zh-CN"},
+        outputs=[chinese_srt],
+        kind=NETWORK,
     )
 
     # Step 3: 生成配音
-    chinese_audio = os.path.join(DOWNLOAD_DIR, f"{base_name}_zh.mp3")
+    chinese_audio = os.path.join(work_dir, f"{base_name}_zh.mp3")
 
     if args.tts == 'chattts':
-        run_command(
-            [VENV_PYTHON, os.path.join(SCRIPTS_DIR, "tts_chattts.py"), chinese_srt, chinese_audio, str(args.seed)],
-            "生成中文配音 (ChatTTS - 高质量)"
-        )
+        tts_script = os.path.join(SCRIPTS_DIR, "tts_chattts.py")
+        # 多进程分片会 fork 当前进程，编排进程里有其他线程时不安全，仍放到子进程中运行
+        if in_process and args.chattts_workers <= 1:
+            tts_cmd = lambda: pipeline.synthesize(chinese_subs(), chinese_audio, "chattts", seed=args.seed,
+                                                  profile=args.chattts_profile,
+                                                  skip_refine=args.chattts_skip_refine)
+        else:
+            tts_cmd = [VENV_PYTHON, tts_script, chinese_srt, chinese_audio, str(args.seed),
+                       "--profile", args.chattts_profile, "--workers", str(args.chattts_workers)]
+            if args.chattts_skip_refine:
+                tts_cmd.append("--skip-refine")
+        tts_params = {"engine": "chattts", "seed": args.seed, "profile": args.chattts_profile,
+                      "skip_refine": args.chattts_skip_refine}
+        tts_description = "生成中文配音 (ChatTTS - 高质量)"
+        tts_kind = CPU
     else:
         # 默认使用 Edge TTS
         voice = args.voice if args.voice in EDGE_VOICES else 'yunxi'
-        run_command(
-            [VENV_PYTHON, os.path.join(SCRIPTS_DIR, "tts_free.py"), chinese_srt, chinese_audio, voice],
-            f"生成中文配音 (Edge TTS - {voice})"
-        )
+        tts_script = os.path.join(SCRIPTS_DIR, "tts_free.py")
+        if in_process:
+            tts_cmd = lambda: pipeline.synthesize(chinese_subs(), chinese_audio, "edge", voice=voice,
+                                                  cache_dir=args.tts_cache_dir)
+        else:
+            tts_cmd = [VENV_PYTHON, tts_script, chinese_srt, chinese_audio, voice]
+            if args.tts_cache_dir:
+                tts_cmd += ["--cache-dir", args.tts_cache_dir]
+        tts_params = {"engine": "edge", "voice": voice}
+        tts_description = f"生成中文配音 (Edge TTS - {voice})"
+        tts_kind = NETWORK
+
+    runner.stage(
+        "tts", tts_cmd, tts_description,
+        inputs={"srt": chinese_srt, "script": tts_script},
+        params=tts_params,
+        outputs=[chinese_audio],
+        kind=tts_kind,
+    )
 
-    # Step 4: 合并视频
+    # Step 4: 合并视频 (字幕先下载时，视频下载和翻译/配音同时进行，到这里才汇合)
+    if isinstance(video_file, Future):
+        if not video_file.done():
+            print(f"\n⏳ 翻译和配音已完成，等待视频下载: {runner.label}{base_name}")
+        video_file = video_file.result()
     output_video = os.path.join(OUTPUT_DIR, f"{base_name}_final.mp4")
 
     # 使用ffmpeg合并：视频轨 + 中文音频
-    run_command(
-        [
-            "ffmpeg", "-y",
-            "-i", video_file,
-            "-i", chinese_audio,
-            "-map", "0:v", "-map", "1:a",
-            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
-            "-c:a", "aac", "-b:a", "192k",
-            output_video
-        ],
-        "合并视频（视频+中文配音）"
+    # 视频流已是抖音兼容的 H.264 (或 --single-encode) 时直接复制，几秒完成，不重新编码
+    copy_video = args.single_encode or args.mux_video == "copy" or (
+        args.mux_video == "auto" and pipeline.can_copy_video(video_file))
+    mux_script = os.path.join(SCRIPTS_DIR, "chunked_encode.py")
+    if copy_video or args.encode_chunks == 1:
+        mux_cmd = pipeline.mux_command(video_file, chinese_audio, output_video, copy_video=copy_video)
+    elif in_process:
+        # 长视频按关键帧分段，多个 libx264 同时编码，拼接后只合并一次配音
+        mux_cmd = lambda: pipeline.mux(video_file, chinese_audio, output_video, copy_video=False,
+                                       chunks=args.encode_chunks)
+    else:
+        mux_cmd = [VENV_PYTHON, mux_script, video_file, output_video,
+                   "--audio", chinese_audio, "--chunks", str(args.encode_chunks)]
+    runner.stage(
+        "mux",
+        mux_cmd,
+        "合并视频（视频+中文配音）" + ("（视频流复制）" if copy_video else "（重新编码）"),
+        inputs={"video": video_file, "audio": chinese_audio},
+        params={"copy_video": copy_video, "encode_chunks": None if copy_video else args.encode_chunks},
+        outputs=[output_video],
     )
 
     # 复制字幕到输出目录
     output_srt = os.path.join(OUTPUT_DIR, f"{base_name}_zh.srt")
-    import shutil
     shutil.copy2(chinese_srt, output_srt)
 
     # Step 5: 烧录字幕到视频
     output_with_subs = os.path.join(OUTPUT_DIR, f"{base_name}_with_subs.mp4")
-    run_command(
-        [VENV_PYTHON, os.path.join(SCRIPTS_DIR, "burn_subtitles.py"),
-         output_video, output_srt, output_with_subs],
-        "烧录中文字幕到视频"
+    # 竖屏版与横屏版在同一个滤镜图中生成 (共用一次解码)
+    output_vertical = os.path.join(OUTPUT_DIR, f"{base_name}_vertical.mp4") if args.vertical != "none" else None
+    vertical = args.vertical if output_vertical else None
+    burn_script = os.path.join(SCRIPTS_DIR, "burn_subtitles.py")
+    if args.single_encode:
+        # 从原视频出发，配音合并和字幕烧录在同一次编码中完成，避免二次编码的画质损失
+        burn_video, burn_audio = video_file, chinese_audio
+        burn_inputs = {"video": video_file, "srt": output_srt, "audio": chinese_audio}
+    else:
+        burn_video, burn_audio = output_video, None
+        burn_inputs = {"video": output_video, "srt": output_srt}
+    burn_inputs["script"] = burn_script
+    if in_process:
+        burn_cmd = lambda: pipeline.burn(burn_video, chinese_subs(), output_with_subs, args.burn_engine, burn_audio,
+                                         args.encode_chunks, vertical, output_vertical)
+    else:
+        burn_cmd = [VENV_PYTHON, burn_script, burn_video, output_srt, output_with_subs,
+                    "--engine", args.burn_engine, "--chunks", str(args.encode_chunks)]
+        if burn_audio:
+            burn_cmd += ["--audio", burn_audio]
+        if vertical:
+            burn_cmd += ["--vertical", vertical, "--vertical-output", output_vertical]
+    runner.stage(
+        "burn", burn_cmd, "烧录中文字幕到视频",
+        inputs=burn_inputs,
+        params={"engine": args.burn_engine, "single_encode": args.single_encode, "vertical": vertical,
+                "encode_chunks": args.encode_chunks},
+        outputs=[output_with_subs, output_vertical] if vertical else [output_with_subs],
     )
 
+    return {"video": output_video, "video_with_subs": output_with_subs, "vertical": output_vertical,
+            "srt": output_srt}
+
+def download_format(args):
+    """总是重新编码时下载画质最高的格式，否则优先下载可以直接复制的 H.264"""
+    return BEST_FORMAT if args.mux_video == "encode" and not args.single_encode else H264_FORMAT
+
+def add_processing_arguments(parser):
+    """单个视频和批量处理共用的参数"""
+    parser.add_argument('--tts', default='edge', choices=['edge', 'chattts'],
+                        help='TTS引擎: edge (快速，需联网) 或 chattts (高质量，需下载模型) (默认: edge)')
+    parser.add_argument('--voice', default='yunxi',
+                        help='Edge TTS声音: xiaoxiao/xiaoyi/yunjian/yunxi/yunxia/yunyang (默认: yunxi)')
+    parser.add_argument('--tts-cache-dir', default=None,
+                        help='Edge TTS 配音片段缓存目录，多个任务可共享 (默认: ~/douyin-video-tool/cache/tts)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='ChatTTS 说话人种子，不同数字产生不同声音 (默认: 42)')
+    parser.add_argument('--chattts-profile', default='default', choices=['default', 'cpu', 'cpu-compile'],
+                        help='ChatTTS 推理配置: default / cpu (无 GPU 时用，int8 量化 + 线程调优) / '
+                             'cpu-compile (再加编译缓存) (默认: default)')
+    parser.add_argument('--chattts-workers', type=int, default=1,
+                        help='ChatTTS 本地推理进程数，多核机器上分片并行合成 (默认: 1)')
+    parser.add_argument('--chattts-skip-refine', action='store_true',
+                        help='ChatTTS 草稿模式: 跳过文本润色，合成快约一倍，适合预览')
+    parser.add_argument('--translate-workers', type=int, default=4,
+                        help='同时进行的翻译请求数 (默认: 4)')
+    parser.add_argument('--translate-rps', type=float, default=3.0,
+                        help='每秒最多翻译请求数，遇到限流自动降速 (默认: 3.0)')
+    parser.add_argument('--burn-engine', default='ass', choices=['ass', 'moviepy'],
+                        help='字幕烧录引擎: ass (ffmpeg+libass，快) 或 moviepy (备用) (默认: ass)')
+    parser.add_argument('--encode-chunks', type=int, default=0,
+                        help='重新编码和烧录字幕时按关键帧分段并行编码的段数，0 表示按时长和核数自动选择 '
+                             '(每段约 4 核、至少 60 秒)，1 表示整段一次编码 (默认: 0)')
+    parser.add_argument('--vertical', default='none', choices=['none', 'blur', 'crop'],
+                        help='烧录字幕时同时输出 1080x1920 竖屏版 (与横屏版同一次渲染): '
+                             'blur (完整画面 + 模糊背景填充) / crop (居中裁剪铺满) (默认: none)')
+    parser.add_argument('--single-encode', action='store_true',
+                        help='每个成品都直接从原视频生成且最多编码一次: 无字幕版视频流直接复制，'
+                             '带字幕版一次完成配音合并和字幕烧录')
+    parser.add_argument('--subprocess-stages', action='store_true',
+                        help='每个步骤启动一个独立的 Python 子进程 (旧方式)；默认在本进程内调用，'
+                             '字幕在内存中传递，后端模块只导入一次')
+    parser.add_argument('--profile-stages', action='store_true',
+                        help='用 cProfile 分析各步骤的内层循环，结果保存在工作区的 profiles/ 目录')
+    parser.add_argument('--mux-video', default='auto', choices=['auto', 'copy', 'encode'],
+                        help='无字幕版的视频流: auto (探测到兼容的 H.264 时直接复制，否则重新编码，下载时优先 H.264) / '
+                             'copy (总是复制) / encode (总是用 libx264 重新编码，下载画质最高的格式) (默认: auto)')
+    parser.add_argument('--sequential-download', action='store_true',
+                        help='视频和字幕一起下载完再开始翻译 (默认先下载字幕，视频在后台下载的同时翻译和配音)')
+    parser.add_argument('--download-fragments', type=int, default=DEFAULT_FRAGMENTS,
+                        help=f'yt-dlp 同时下载的分片数 (默认: {DEFAULT_FRAGMENTS})')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略步骤缓存，所有步骤都重新执行 (默认只重跑输入或参数有变化的步骤)')
+    parser.add_argument('--browser', default='chrome', choices=['chrome', 'safari', 'firefox', 'edge'],
+                        help='用于获取cookies的浏览器 (默认: chrome)')
+
+def parse_processing_arguments(parser):
+    """解析参数并检查互相冲突的处理参数"""
+    args = parser.parse_args()
+    if args.vertical != 'none' and args.burn_engine == 'moviepy':
+        parser.error('--vertical 需要 --burn-engine ass (moviepy 引擎不能生成竖屏版)')
+    return args
+
+def main():
+    parser = argparse.ArgumentParser(description='抖音科普视频一键处理工具 (完全免费版)')
+    parser.add_argument('url', help='YouTube视频URL')
+    parser.add_argument('--skip-download', action='store_true',
+                        help='不联网下载，只使用该视频已下载的文件 (已下载过的视频默认也会自动复用)')
+    add_processing_arguments(parser)
+    args = parse_processing_arguments(parser)
+
+    # 确保目录存在
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    runner = StageRunner(force=args.force)
+
+    # Step 1: 下载视频（每个视频独立工作区，下载文件按内容存储）
+    entry = fetch_video(args.url, args.browser, runner, args.skip_download,
+                        overlap=not args.sequential_download, fragments=args.download_fragments,
+                        video_format=download_format(args))
+    work_dir = job_dir(entry['id'])
+
+    video = "后台下载中" if isinstance(entry['video'], Future) else entry['video']
+    print(f"\n📁 视频文件: {video}")
+    print(f"📁 字幕文件: {entry['srt']}")
+    print(f"📁 工作目录: {work_dir}")
+
+    outputs = process_video(args, runner, entry['video'], entry['srt'], work_dir, entry['title'])
+
+    runner.print_summary()
+
     print(f"\n{'='*50}")
     print(f"🎉 处理完成！")
     print(f"{'='*50}")
-    print(f"📁 无字幕视频: {output_video}")
-    print(f"📁 带字幕视频: {output_with_subs}")
-    print(f"📁 字幕文件: {output_srt}")
+    print(f"📁 无字幕视频: {outputs['video']}")
+    print(f"📁 带字幕视频: {outputs['video_with_subs']}")
+    if outputs['vertical']:
+        print(f"📁 竖屏视频: {outputs['vertical']}")
+    print(f"📁 字幕文件: {outputs['srt']}")
     print(f"\n下一步:")
-    print(f"1. 用剪映打开带字幕视频")
-    print(f"2. 调整为9:16竖屏（裁剪或添加背景）")
-    print(f"3. 添加片头片尾")
-    print(f"4. 发布到抖音")
+    if outputs['vertical']:
+        print(f"1. 用剪映打开竖屏视频")
+        print(f"2. 添加片头片尾")
+        print(f"3. 发布到抖音")
+    else:
+        print(f"1. 用剪映打开带字幕视频")
+        print(f"2. 调整为9:16竖屏（裁剪或添加背景，或使用 --vertical blur|crop 直接输出）")
+        print(f"3. 添加片头片尾")
+        print(f"4. 发布到抖音")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+自适应令牌桶限速器 - 供并发请求在线服务（Google Translate 等）使用
+特点：
+1. 线程安全，多个工作线程共享同一个桶
+2. 遇到限流 (429) 时速率减半，成功请求后逐步恢复
+"""
+
+import time
+import random
+import threading
+
+
+class TokenBucket:
+    """令牌桶：平均每秒最多 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate: float, burst: int = None, min_rate: float = 0.2):
+        if rate <= 0:
+            raise ValueError(f"rate 必须大于 0: {rate}")
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        """服务端限流：速率减半并清空令牌"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.updated = time.monotonic()
+
+    def succeeded(self):
+        """请求成功：速率缓慢恢复到上限"""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """指数退避等待时间（带随机抖动）"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
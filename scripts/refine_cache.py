@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+ChatTTS 文本润色缓存 - 使用 SQLite 持久化保存润色结果
+特点：
+1. 以 hash(模型版本, 提示词, 说话人种子, 原文) 为键；原文不做规范化，空白和标点也会影响润色结果
+2. 命中/未命中统计
+3. 超过容量上限时按最近使用时间淘汰
+
+用法: python refine_cache.py [db_path]   # 查看缓存状态
+"""
+
+import sys
+import os
+import time
+import hashlib
+import sqlite3
+
+DEFAULT_DB_PATH = os.path.expanduser("~/douyin-video-tool/cache/chattts_refine.db")
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def refine_key(model: str, prompt: str, seed: int, text: str) -> str:
+    """生成润色缓存键"""
+    raw = "\0".join([model, prompt, str(seed), text])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class RefineCache:
+    """基于 SQLite 的润色结果缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        # WAL 模式允许多个任务同时读写同一个缓存
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # 旧版本借用翻译记忆的表保存润色结果，键里没有模型版本，直接丢弃
+        self.conn.execute("DROP TABLE IF EXISTS memory")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS refine ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " seed INTEGER NOT NULL,"
+            " source TEXT NOT NULL,"
+            " refined TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_refine_last_used ON refine(last_used)")
+        self.conn.commit()
+
+    def get(self, text: str, model: str, prompt: str, seed: int):
+        """查找缓存的润色结果，未命中返回 None"""
+        key = refine_key(model, prompt, seed, text)
+        row = self.conn.execute("SELECT refined FROM refine WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute("UPDATE refine SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0]
+
+    def put(self, text: str, model: str, prompt: str, seed: int, refined: str):
+        """保存润色结果"""
+        if not refined:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO refine (key, model, prompt, seed, source, refined, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (refine_key(model, prompt, seed, text), model, prompt, seed, text, refined, time.time())
+        )
+        self.conn.commit()
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """超过容量上限时删除最久未使用的条目"""
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM refine WHERE key IN "
+            "(SELECT key FROM refine ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self.conn.commit()
+        return excess
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM refine").fetchone()[0]
+
+    def stats(self) -> dict:
+        """返回命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    if not os.path.exists(db_path):
+        print(f"⚠️ 缓存不存在: {db_path}")
+        sys.exit(1)
+
+    cache = RefineCache(db_path)
+    print(f"📁 润色缓存: {db_path}")
+    print(f"   共 {len(cache)} 条记录")
+    for model, prompt, seed, count in cache.conn.execute(
+        "SELECT model, prompt, seed, COUNT(*) FROM refine GROUP BY model, prompt, seed"
+    ):
+        print(f"   ChatTTS {model} {prompt} seed={seed}: {count}")
+    cache.close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+配音片段缓存 - 按内容寻址保存已合成的音频片段
+特点：
+1. 以 hash(引擎, 引擎版本, 声音, 语速/音调, 文本) 为键
+2. 写入使用临时文件 + 原子重命名，多个任务可共享同一缓存目录
+3. 超过容量上限时按最近使用时间 (LRU) 淘汰
+
+用法: python segment_cache.py [cache_dir]   # 查看缓存状态
+"""
+
+import sys
+import os
+import time
+import hashlib
+import tempfile
+import fcntl
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/douyin-video-tool/cache/tts")
+DEFAULT_MAX_MB = 2048
+
+
+def segment_key(engine: str, version: str, voice: str, text: str, **params) -> str:
+    """生成片段缓存键，params 为语速、音调等影响音频的参数"""
+    parts = [engine, version, voice, text.strip()]
+    parts.extend(f"{name}={params[name]}" for name in sorted(params))
+    return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """内容寻址的音频片段缓存目录"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 ext: str = ".mp3"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + self.ext)
+
+    def load(self, key: str):
+        """读取缓存的片段数据，未命中返回 None"""
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return data
+
+    def discard(self, key: str):
+        """删除无法解码的片段，并把刚才 load() 记的命中改为未命中 (随后会重新合成)"""
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        self.hits -= 1
+        self.misses += 1
+
+    def _atomic_write(self, key: str, write):
+        """先写临时文件再原子重命名，其他任务永远不会读到写了一半的片段"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def store_bytes(self, key: str, data: bytes):
+        """把内存中的片段数据存入缓存"""
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        self._atomic_write(key, write)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(self.ext):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """删除最久未使用的片段直到总大小不超过上限，返回删除的文件数"""
+        lock_path = os.path.join(self.cache_dir, ".evict.lock")
+        with open(lock_path, "w") as lock_file:
+            # 同一时间只允许一个任务清理
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        print(f"⚠️ 缓存不存在: {cache_dir}")
+        sys.exit(1)
+
+    cache = SegmentCache(cache_dir)
+    entries = list(cache._entries())
+    total = sum(size for _, size, _ in entries)
+    print(f"📁 配音片段缓存: {cache_dir}")
+    print(f"   共 {len(entries)} 个片段，{total / 1024 / 1024:.1f} MB")
+    if entries:
+        oldest = min(mtime for _, _, mtime in entries)
+        print(f"   最久未使用: {time.strftime('%Y-%m-%d %H:%M', time.localtime(oldest))}")
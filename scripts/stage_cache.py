@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+处理步骤缓存 - 每个视频一个清单文件，记录各步骤输入/参数/输出的内容哈希
+输入和参数都没变、输出也还在且未被修改的步骤可以直接复用；
+上游输出一变，下游步骤的输入哈希随之改变，自然只重跑受影响的部分。
+
+用法: python stage_cache.py <manifest.json>   # 查看清单
+"""
+
+import sys
+import os
+import json
+import hashlib
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class StageManifest:
+    """单个视频的步骤清单"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"files": {}, "stages": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ 清单损坏，忽略: {path}")
+        self.data.setdefault("files", {})
+        self.data.setdefault("stages", {})
+
+    def digest(self, path: str) -> str:
+        """文件内容哈希；大小和修改时间都没变时直接用上次算好的结果"""
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.data["files"].get(path)
+        if cached and cached["stamp"] == stamp:
+            return cached["sha256"]
+        digest = sha256_file(path)
+        self.data["files"][path] = {"stamp": stamp, "sha256": digest}
+        return digest
+
+    def _snapshot(self, paths: dict) -> dict:
+        return {name: self.digest(path) for name, path in paths.items()}
+
+    def is_fresh(self, stage: str, inputs: dict, params: dict, outputs: list) -> bool:
+        """步骤记录的输入、参数、输出都与当前一致时返回 True
+
+        inputs: {名称: 文件路径}
+        params: 影响输出的参数
+        outputs: 输出文件路径列表
+        """
+        record = self.data["stages"].get(stage)
+        if not record:
+            return False
+        if record["params"] != params:
+            return False
+        if not all(os.path.exists(path) for path in list(inputs.values()) + outputs):
+            return False
+        if record["inputs"] != self._snapshot(inputs):
+            return False
+        return record["outputs"] == {path: self.digest(path) for path in outputs}
+
+    def record(self, stage: str, inputs: dict, params: dict, outputs: list):
+        """步骤成功后记录当前的输入、参数和输出"""
+        self.data["stages"][stage] = {
+            "inputs": self._snapshot(inputs),
+            "params": params,
+            "outputs": {path: self.digest(path) for path in outputs},
+        }
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python stage_cache.py <manifest.json>")
+        sys.exit(1)
+
+    manifest = StageManifest(sys.argv[1])
+    for stage, record in manifest.data["stages"].items():
+        print(f"🔹 {stage}")
+        print(f"   参数: {record['params']}")
+        for path in record["outputs"]:
+            print(f"   输出: {path}")
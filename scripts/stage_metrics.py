@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+处理步骤的性能记录
+特点：
+1. 每个步骤记录墙钟时间、子进程 CPU 时间 (user/sys)、峰值内存 (wait4 资源统计)
+2. 记录步骤读写的字节数，以及子脚本上报的条目数 (字幕条数、句子组数、配音片段数等)
+3. 每个视频一个 metrics.jsonl，结束时打印汇总表
+4. 可选 cProfile：子脚本的内层循环用 profiled() 包起来，设置环境变量后自动保存 .prof 文件
+5. 在本进程内运行的步骤 (pipeline.py) 用 measure_call()：资源统计取 getrusage 差值，
+   条目数、性能分析目录和第一次导入后端模块的耗时通过线程局部变量传递
+
+用法: python stage_metrics.py <metrics.jsonl>   # 打印汇总表
+"""
+
+import sys
+import os
+import json
+import time
+import cProfile
+import resource
+import importlib
+import threading
+import subprocess
+import unicodedata
+from contextlib import contextmanager
+
+# 父进程通过环境变量告诉子脚本把条目数写到哪里、性能分析文件存到哪里
+METRICS_ENV = "DOUYIN_STAGE_METRICS"
+PROFILE_ENV = "DOUYIN_PROFILE_DIR"
+
+# 本进程内运行的步骤：counts / profile_dir / import_seconds，批量模式下各线程互不干扰
+_stage = threading.local()
+
+# CPython 同一时间只能有一个 cProfile 在运行 (3.12+ 嵌套 enable() 会抛 ValueError)，
+# 已有分析器在运行时内层的 profiled() 不再新建，其耗时计入外层
+_profiler_lock = threading.Lock()
+_active_profiler = None
+
+
+def report_counts(**counts):
+    """子脚本上报条目数，例如 report_counts(cues=120, groups=45)；不在流水线中运行时什么都不做"""
+    if getattr(_stage, "counts", None) is not None:
+        _stage.counts.update(counts)
+        return
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(counts) + "\n")
+
+
+@contextmanager
+def profiled(name: str):
+    """设置了 DOUYIN_PROFILE_DIR 时用 cProfile 分析这段代码，结果保存为 <name>-<pid>.prof
+
+    不嵌套：已有 profiled() 在运行 (外层步骤，或批量模式下的其他线程) 时直接执行
+    """
+    global _active_profiler
+    profile_dir = getattr(_stage, "profile_dir", None) or os.environ.get(PROFILE_ENV)
+    if not profile_dir:
+        yield
+        return
+    with _profiler_lock:
+        if _active_profiler is not None:
+            profiler = None
+        else:
+            profiler = _active_profiler = cProfile.Profile()
+    if profiler is None:
+        yield
+        return
+    os.makedirs(profile_dir, exist_ok=True)
+    try:
+        profiler.enable()
+        yield
+    finally:
+        profiler.disable()
+        with _profiler_lock:
+            _active_profiler = None
+        path = os.path.join(profile_dir, f"{name}-{os.getpid()}-{threading.get_ident()}.prof")
+        profiler.dump_stats(path)
+        print(f"📁 性能分析: {path}")
+
+
+def path_bytes(paths) -> int:
+    """文件或目录 (递归) 的总字节数，不存在的路径按 0 计"""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def maxrss_mb(rusage) -> float:
+    return maxrss_mb_value(rusage.ru_maxrss)
+
+
+def maxrss_mb_value(maxrss: int) -> float:
+    # Linux 上 ru_maxrss 单位是 KB，macOS 上是字节
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return maxrss / scale
+
+
+def run_measured(cmd, env: dict = None, on_start=None) -> tuple:
+    """运行命令并等待结束，返回 (退出码, 资源统计)
+
+    资源统计来自 wait4，包含命令本身及其等待过的子进程 (例如 shell 启动的 yt-dlp/ffmpeg)
+    on_start: 可选，进程启动后以 Popen 对象调用；此时命令在独立的进程组中运行，
+              调用方可以用 os.killpg 终止整个进程组 (shell 和它启动的 yt-dlp/ffmpeg)
+    """
+    proc = subprocess.Popen(cmd, shell=isinstance(cmd, str), env=env, start_new_session=on_start is not None)
+    if on_start is not None:
+        on_start(proc)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, {
+        "user": round(rusage.ru_utime, 2),
+        "sys": round(rusage.ru_stime, 2),
+        "max_rss_mb": round(maxrss_mb(rusage), 1),
+    }
+
+
+def import_backend(name: str):
+    """导入后端模块；第一次导入的耗时计入当前步骤的 import 时间"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if getattr(_stage, "counts", None) is not None:
+        _stage.import_seconds += time.perf_counter() - start
+    return module
+
+
+def _rusage_seconds(who) -> tuple:
+    usage = resource.getrusage(who)
+    return usage.ru_utime, usage.ru_stime, usage.ru_maxrss
+
+
+def measure_call(fn, profile_dir: str = None) -> tuple:
+    """在本进程内调用 fn()，返回 (异常或 None, 资源统计, 条目数)
+
+    CPU 时间是本进程和期间结束的子进程 (ffmpeg 等) 的 getrusage 差值；
+    批量模式下同时运行的其他步骤也会计入，峰值内存是整个进程的峰值
+    """
+    _stage.counts = {}
+    _stage.profile_dir = profile_dir
+    _stage.import_seconds = 0.0
+    before = [_rusage_seconds(resource.RUSAGE_SELF), _rusage_seconds(resource.RUSAGE_CHILDREN)]
+    error = None
+    try:
+        fn()
+    except (Exception, SystemExit) as e:
+        error = e
+    finally:
+        after = [_rusage_seconds(resource.RUSAGE_SELF), _rusage_seconds(resource.RUSAGE_CHILDREN)]
+        counts = _stage.counts
+        import_seconds = _stage.import_seconds
+        _stage.counts = _stage.profile_dir = None
+    usage = {
+        "user": round(sum(a[0] - b[0] for a, b in zip(after, before)), 2),
+        "sys": round(sum(a[1] - b[1] for a, b in zip(after, before)), 2),
+        "max_rss_mb": round(max(maxrss_mb_value(a[2]) for a in after), 1),
+        "import": round(import_seconds, 2),
+    }
+    return error, usage, counts
+
+
+def read_counts(path: str) -> dict:
+    """合并子脚本上报的条目数"""
+    counts = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    counts.update(json.loads(line))
+    return counts
+
+
+class MetricsLog:
+    """一个视频的步骤记录，追加写入 JSONL；设置文件之前的记录先保存在内存中"""
+
+    def __init__(self, path: str = None):
+        self.path = None
+        self.run = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.records = []
+        # 后台下载线程和流水线主线程会同时记录
+        self._lock = threading.Lock()
+        if path:
+            self.set_path(path)
+
+    def set_path(self, path: str):
+        with self._lock:
+            self.path = path
+            for record in self.records:
+                self._write(record)
+
+    def add(self, record: dict):
+        record = {"run": self.run, **record}
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                self._write(record)
+
+    def _write(self, record: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def pad(text: str, width: int, left: bool = False) -> str:
+    """按显示宽度对齐 (中文字符占两格)"""
+    display = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    space = " " * max(0, width - display)
+    return text + space if left else space + text
+
+
+def print_table(records: list):
+    """打印步骤汇总表"""
+    header = [pad("墙钟", 8), pad("导入", 7), pad("user", 8), pad("sys", 7), pad("峰值内存", 9),
+              pad("读入", 9), pad("写出", 9)]
+    print(f"   {pad('步骤', 10, left=True)} {' '.join(header)}  条目")
+    totals = {"wall": 0.0, "user": 0.0, "sys": 0.0}
+    for r in records:
+        if r.get("reused"):
+            print(f"   {r['stage']:<10} {'♻️ 复用':>8}")
+            continue
+        for key in totals:
+            totals[key] += r.get(key, 0.0)
+        counts = " ".join(f"{k}={v}" for k, v in r.get("counts", {}).items())
+        # 子进程步骤的导入时间包含在墙钟时间里，无法单独统计
+        imported = f"{r['import']:>6.2f}s" if "import" in r else f"{'-':>7}"
+        print(f"   {r['stage']:<10} {r['wall']:>7.1f}s {imported} {r['user']:>7.1f}s {r['sys']:>6.1f}s "
+              f"{r['max_rss_mb']:>7.0f}MB {format_bytes(r['bytes_in']):>9} {format_bytes(r['bytes_out']):>9}  {counts}")
+    print(f"   {pad('合计', 10, left=True)} {totals['wall']:>7.1f}s {'':>7} {totals['user']:>7.1f}s {totals['sys']:>6.1f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python stage_metrics.py <metrics.jsonl>")
+        sys.exit(1)
+
+    with open(sys.argv[1], encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for run in dict.fromkeys(r["run"] for r in records):
+        print(f"🔹 {run}")
+        print_table([r for r in records if r["run"] == run])
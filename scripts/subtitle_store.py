@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+紧凑的字幕表示 - 替代各步骤重复的 pysrt.open
+特点：
+1. 开始/结束时间 (毫秒) 存在 array('i') 中，文本是驻留 (intern) 的字符串列表，重复的句子只存一份
+2. 正则一次扫描整个文件的 SRT/VTT 解析器，以及对应的写出函数
+3. 翻译等步骤只替换文本、共享时间轴，各步骤之间可以直接传递同一个对象
+
+用法: python subtitle_store.py <subtitles.srt|vtt> [output.srt|vtt]   # 解析 (并转换格式)
+"""
+
+import sys
+import re
+import time
+from array import array
+from typing import NamedTuple
+
+TIME = r'(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})'
+# 时间轴行 + 其后直到空行的文本行 (时间轴行后面的 VTT 样式设置忽略)
+CUE_RE = re.compile(
+    rf'^[ \t]*{TIME}[ \t]*-->[ \t]*{TIME}[^\n]*\n?((?:(?![^\n]*-->)[^\n]*\S[^\n]*(?:\n|$))*)',
+    re.M,
+)
+VTT_TAG_RE = re.compile(r'<[^>\n]+>')
+
+
+class Cue(NamedTuple):
+    start: int  # 毫秒
+    end: int
+    text: str
+
+
+class Subtitles:
+    """字幕列表：starts / ends 为 array('i') 毫秒，texts 为字符串列表"""
+
+    __slots__ = ("starts", "ends", "texts", "_flat")
+
+    def __init__(self, starts=(), ends=(), texts=()):
+        self.starts = starts if isinstance(starts, array) else array('i', starts)
+        self.ends = ends if isinstance(ends, array) else array('i', ends)
+        self.texts = [sys.intern(text) for text in texts]
+        self._flat = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i) -> Cue:
+        return Cue(self.starts[i], self.ends[i], self.texts[i])
+
+    def __iter__(self):
+        return map(Cue, self.starts, self.ends, self.texts)
+
+    def append(self, start: int, end: int, text: str):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(sys.intern(text))
+        self._flat = None
+
+    def flat_texts(self) -> list:
+        """多行字幕合并为一行后的文本 (只计算一次)"""
+        if self._flat is None:
+            self._flat = [text.replace('\n', ' ').strip() for text in self.texts]
+        return self._flat
+
+    def with_texts(self, texts) -> "Subtitles":
+        """时间轴不变、替换文本后的新字幕 (例如译文)；时间数组与原字幕共享，不复制"""
+        if len(texts) != len(self.texts):
+            raise ValueError(f"文本数量 {len(texts)} 与字幕条数 {len(self.texts)} 不一致")
+        return Subtitles(self.starts, self.ends, texts)
+
+    def window(self, start_ms: int, end_ms: int) -> "Subtitles":
+        """[start_ms, end_ms) 时间段内的字幕，时间轴平移到从 0 开始并裁剪到段内 (分段编码时每段一份)"""
+        length = end_ms - start_ms
+        window = Subtitles()
+        for start, end, text in zip(self.starts, self.ends, self.texts):
+            if end > start_ms and start < end_ms:
+                window.append(max(0, start - start_ms), min(length, end - start_ms), text)
+        return window
+
+    def save(self, path: str):
+        """按扩展名写出 SRT 或 VTT"""
+        data = format_vtt(self) if path.lower().endswith(".vtt") else format_srt(self)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+        return path
+
+
+def _ms(hours, minutes, seconds, millis) -> int:
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis.ljust(3, '0'))
+
+
+def parse(data: str, vtt: bool = False) -> Subtitles:
+    """解析 SRT / VTT 文本；VTT 的 <c>、<b> 等内联标签会被去掉"""
+    data = data.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    starts = array('i')
+    ends = array('i')
+    texts = []
+    for m in CUE_RE.finditer(data):
+        h1, m1, s1, f1, h2, m2, s2, f2, text = m.groups()
+        text = text.strip()
+        if vtt:
+            text = VTT_TAG_RE.sub('', text)
+        starts.append(_ms(h1, m1, s1, f1))
+        ends.append(_ms(h2, m2, s2, f2))
+        texts.append(text)
+    return Subtitles(starts, ends, texts)
+
+
+def load(path: str) -> Subtitles:
+    """读取 SRT / VTT 文件 (UTF-8，兼容 BOM；无法解码的字节用替换字符代替)"""
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        return parse(f.read(), vtt=path.lower().endswith(".vtt"))
+
+
+def as_subtitles(source) -> Subtitles:
+    """接受文件路径或 Subtitles，统一返回 Subtitles，便于步骤之间直接传递"""
+    return source if isinstance(source, Subtitles) else load(source)
+
+
+def format_timestamp(ms: int, separator: str = ",") -> str:
+    ms = max(0, ms)
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def format_srt(subs: Subtitles) -> str:
+    blocks = [
+        f"{i}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+        for i, (start, end, text) in enumerate(subs, start=1)
+    ]
+    return "".join(blocks)
+
+
+def format_vtt(subs: Subtitles) -> str:
+    blocks = [
+        f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n"
+        for start, end, text in subs
+    ]
+    return "WEBVTT\n\n" + "".join(blocks)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python subtitle_store.py <subtitles.srt|vtt> [output.srt|vtt]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    subs = load(sys.argv[1])
+    elapsed = time.perf_counter() - start
+    print(f"📖 {sys.argv[1]}: {len(subs)} 条字幕，解析 {elapsed * 1000:.1f}ms")
+    if len(subs):
+        print(f"   时长 {subs.ends[-1] / 1000:.1f}s，不同文本 {len(set(map(id, subs.texts)))} 条")
+    if len(sys.argv) > 2:
+        subs.save(sys.argv[2])
+        print(f"📁 保存到: {sys.argv[2]}")
@@ -3,18 +3,46 @@
 字幕翻译脚本 V2 - 改进的上下文感知翻译
 特点：
 1. 合并分段句子以保持上下文
-2. 使用标点符号智能断句
+2. 使用标点符号智能断句，没有标点的自动字幕按长度、条数和停顿切分
 3. 翻译后按时间重新分配
+4. 翻译记忆缓存，重复句子不再请求 Google
+5. 并发翻译 + 令牌桶限速，失败的句子组指数退避重试
+6. 多个句子组打包成一个请求，大幅减少请求次数
 
-用法: python translate_google_v2.py <input.srt> [output.srt]
+用法: python translate_google_v2.py <input.srt> [output.srt] [--no-cache]
 """
 
 import sys
 import os
 import time
 import re
-import pysrt
-from deep_translator import GoogleTranslator
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from translation_memory import TranslationMemory, DEFAULT_DB_PATH, DEFAULT_MAX_ENTRIES, normalize_text
+from rate_limiter import TokenBucket, backoff_delay
+from stage_metrics import profiled, report_counts
+from subtitle_store import Subtitles, as_subtitles
+
+ENGINE = 'google'
+SOURCE_LANG = 'en'
+TARGET_LANG = 'zh-CN'
+
+# 并发翻译默认参数
+DEFAULT_WORKERS = 4
+DEFAULT_RPS = 3.0
+DEFAULT_RETRIES = 4
+
+# 打包翻译：多个句子组拼成一个请求，用分隔行隔开 (Google 单次上限 5000 字符)
+PACK_DELIMITER = '\n@@@\n'
+PACK_SPLIT_RE = re.compile(r'\s*@@@\s*')
+DEFAULT_PACK_CHARS = 4500
+
+# 句子组上限：没有标点的自动生成字幕 (--write-auto-sub) 按长度、条数和停顿切分，避免整篇合成一个超长请求；
+# 有标点的字幕仍只按句末标点合并 (仅以单个请求的字符上限兜底)
+DEFAULT_GROUP_CHARS = 400
+DEFAULT_GROUP_CUES = 12
+DEFAULT_GROUP_GAP_MS = 1500
 
 
 def is_sentence_end(text: str) -> bool:
@@ -26,23 +54,55 @@ def is_sentence_end(text: str) -> bool:
     return text[-1] in '.?!。？！'
 
 
-def merge_subtitle_groups(subs) -> list:
-    """将相邻的字幕合并成完整句子组"""
-    groups = []  # [(start_idx, end_idx, merged_text)]
+def is_punctuated(texts: list, max_cues: int = DEFAULT_GROUP_CUES) -> bool:
+    """平均每 max_cues 条字幕至少有一个句末标点时视为有标点的字幕；自动生成的字幕几乎没有标点"""
+    spoken = [text for text in texts if text]
+    ends = sum(1 for text in spoken if is_sentence_end(text))
+    return ends > 0 and ends * max_cues >= len(spoken)
 
-    i = 0
-    while i < len(subs):
-        start_idx = i
-        merged_text = subs[i].text.replace('\n', ' ').strip()
 
-        # 继续合并直到遇到句子结束
-        while i < len(subs) - 1 and not is_sentence_end(merged_text):
-            i += 1
-            next_text = subs[i].text.replace('\n', ' ').strip()
-            merged_text = merged_text + ' ' + next_text
+def merge_subtitle_groups(subs: Subtitles, max_chars: int = DEFAULT_GROUP_CHARS,
+                          max_cues: int = DEFAULT_GROUP_CUES, max_gap_ms: int = DEFAULT_GROUP_GAP_MS) -> list:
+    """将相邻的字幕合并成完整句子组
 
-        groups.append((start_idx, i, merged_text))
-        i += 1
+    有标点的字幕遇到句末标点时结束一组，与以前相同 (只有超过单个请求上限 DEFAULT_PACK_CHARS 时才切开)；
+    没有标点的自动字幕 (见 is_punctuated) 不会无限合并：遇到超过 max_gap_ms 的停顿时结束一组，
+    一组超过 max_chars 字符或 max_cues 条时，在组内停顿最长的位置切开
+    """
+    groups = []  # [(start_idx, end_idx, merged_text)]
+    texts = subs.flat_texts()
+    starts, ends = subs.starts, subs.ends
+    if is_punctuated(texts, max_cues):
+        max_chars, max_cues, max_gap_ms = DEFAULT_PACK_CHARS, float('inf'), float('inf')
+
+    def close(first, last):
+        groups.append((first, last, ' '.join(texts[first:last + 1])))
+
+    first = 0
+    length = 0       # 当前组合并后的字符数
+    last_text = ''   # 当前组最后一条非空文本，用于判断句末
+    for i, text in enumerate(texts):
+        if i > first:
+            if length + 1 + len(text) > max_chars or i - first >= max_cues:
+                # 超出上限：在组的后半段找与前一条间隔最长的位置切开 (停顿相同时取最靠后的)，
+                # 优先在停顿处断句，同时避免切出过短的组
+                cut = max(range(first + (i - first + 1) // 2, i + 1),
+                          key=lambda k: (starts[k] - ends[k - 1], k))
+                close(first, cut - 1)
+                length = sum(len(t) for t in texts[cut:i]) + max(0, i - cut - 1)
+                first = cut
+                last_text = next((t for t in reversed(texts[cut:i]) if t), '')
+            if i > first:
+                length += 1
+        length += len(text)
+        if text:
+            last_text = text
+
+        if i == len(texts) - 1 or is_sentence_end(last_text) or starts[i + 1] - ends[i] > max_gap_ms:
+            close(first, i)
+            first = i + 1
+            length = 0
+            last_text = ''
 
     return groups
 
@@ -90,14 +150,126 @@ def split_translation(original_texts: list, translated_text: str) -> list:
     return results
 
 
-def translate_subtitles(input_file: str, output_file: str = None):
-    """使用上下文感知的方式翻译 SRT 字幕文件"""
+def is_throttle_error(error: Exception) -> bool:
+    """判断是否是 Google 的限流错误"""
+    from deep_translator.exceptions import TooManyRequests
+    return isinstance(error, TooManyRequests) or '429' in str(error)
+
+
+def translate_with_retry(get_translator, text: str, bucket: TokenBucket, retries: int = 4) -> str:
+    """限速 + 指数退避重试地翻译一段文本，重试用尽后抛出最后一次的异常"""
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            translated = get_translator().translate(text)
+            if not translated:
+                raise ValueError("翻译结果为空")
+            bucket.succeeded()
+            return translated
+        except Exception as e:
+            if is_throttle_error(e):
+                bucket.throttled()
+            if attempt == retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+
+
+def pack_texts(texts: list, budget: int) -> list:
+    """把文本按字符预算打包，返回 [[text, ...], ...]；budget <= 0 时不打包"""
+    if budget <= 0:
+        return [[text] for text in texts]
+
+    packs = []
+    current = []
+    current_len = 0
+    for text in texts:
+        added = len(text) + (len(PACK_DELIMITER) if current else 0)
+        if current and current_len + added > budget:
+            packs.append(current)
+            current = []
+            current_len = 0
+            added = len(text)
+        current.append(text)
+        current_len += added
+    if current:
+        packs.append(current)
+    return packs
+
+
+def translate_each(get_translator, texts: list, bucket: TokenBucket, retries: int = 4) -> list:
+    """逐个句子组翻译，重试后仍失败的句子组返回 None (不影响同一个包里其他句子组的译文)"""
+    results = []
+    for text in texts:
+        try:
+            results.append(translate_with_retry(get_translator, text, bucket, retries))
+        except Exception as e:
+            print(f"⚠️ 句子组翻译失败 (已重试 {retries} 次): {e}")
+            results.append(None)
+    return results
+
 
-    translator = GoogleTranslator(source='en', target='zh-CN')
+def translate_pack(get_translator, texts: list, bucket: TokenBucket, retries: int = 4) -> list:
+    """翻译一个打包的请求，返回与 texts 一一对应的译文 (失败的句子组为 None)
+
+    打包请求重试后仍失败，或译文中的分隔符数量对不上时，退回逐个句子组翻译
+    """
+    if len(texts) == 1:
+        return translate_each(get_translator, texts, bucket, retries)
+
+    try:
+        translated = translate_with_retry(get_translator, PACK_DELIMITER.join(texts), bucket, retries)
+    except Exception as e:
+        print(f"⚠️ 打包翻译失败 ({len(texts)} 组，已重试 {retries} 次)，改为逐条翻译: {e}")
+        return translate_each(get_translator, texts, bucket, retries)
+    parts = [part.strip() for part in PACK_SPLIT_RE.split(translated.strip())]
+    if len(parts) == len(texts) and all(parts):
+        return parts
+
+    print(f"⚠️ 打包翻译分隔符不匹配 ({len(parts)}/{len(texts)})，改为逐条翻译")
+    return translate_each(get_translator, texts, bucket, retries)
+
+
+def translate_subtitles(
+    input_file: "str | Subtitles",
+    output_file: str = None,
+    memory: TranslationMemory = None,
+    workers: int = DEFAULT_WORKERS,
+    rps: float = DEFAULT_RPS,
+    retries: int = DEFAULT_RETRIES,
+    pack_chars: int = DEFAULT_PACK_CHARS,
+    translator_factory=None,
+):
+    """使用上下文感知的方式翻译 SRT 字幕文件
+
+    input_file: 字幕路径，或已经解析好的 Subtitles (由上一步直接传入，不再重新读文件)；
+                传入 Subtitles 且 output_file 为 None 时返回译文 Subtitles，否则返回输出路径
+    memory: 翻译记忆缓存，为 None 时每个句子组都请求 Google
+    workers: 同时进行的翻译请求数
+    rps: 每秒最多请求数（遇到限流自动降速）
+    retries: 每个句子组失败后的重试次数
+    pack_chars: 每个请求最多打包的字符数，0 表示每个句子组单独请求
+    translator_factory: 创建翻译器的函数 (返回带 translate(text) 方法的对象)，默认 GoogleTranslator；
+                        基准测试用它换成离线的模拟翻译器
+    """
+    if translator_factory is None:
+        # deep_translator (requests + bs4) 只在真正请求 Google 时才导入
+        from deep_translator import GoogleTranslator
+        translator_factory = lambda: GoogleTranslator(source=SOURCE_LANG, target=TARGET_LANG)
+
+    # GoogleTranslator 会在实例上保存请求参数，不能跨线程共享
+    local = threading.local()
+
+    def get_translator():
+        if not hasattr(local, 'translator'):
+            local.translator = translator_factory()
+        return local.translator
 
     # 读取字幕
-    print(f"📖 读取字幕: {input_file}")
-    subs = pysrt.open(input_file)
+    if isinstance(input_file, Subtitles):
+        subs = input_file
+    else:
+        print(f"📖 读取字幕: {input_file}")
+        subs = as_subtitles(input_file)
     total = len(subs)
     print(f"   共 {total} 条字幕")
 
@@ -106,65 +278,130 @@ def translate_subtitles(input_file: str, output_file: str = None):
     groups = merge_subtitle_groups(subs)
     print(f"   合并为 {len(groups)} 个句子组")
 
-    # 翻译每个句子组
-    print(f"🔄 使用 Google Translate 翻译...")
-    translations = {}  # idx -> translated_text
-
-    for group_idx, (start_idx, end_idx, merged_text) in enumerate(groups):
-        if (group_idx + 1) % 10 == 0:
-            print(f"   处理句子组 {group_idx + 1}/{len(groups)}...")
-
-        try:
-            # 翻译合并后的句子
-            translated = translator.translate(merged_text)
-
-            if start_idx == end_idx:
-                # 单条字幕，直接使用翻译结果
-                translations[start_idx] = translated
-            else:
-                # 多条字幕合并的，需要分割
-                original_texts = [subs[i].text.replace('\n', ' ').strip()
-                                  for i in range(start_idx, end_idx + 1)]
-                split_results = split_translation(original_texts, translated)
-
-                for i, idx in enumerate(range(start_idx, end_idx + 1)):
-                    translations[idx] = split_results[i]
-
-        except Exception as e:
-            print(f"⚠️ 翻译失败 (组 {group_idx}): {e}")
-            # 保留原文
-            for idx in range(start_idx, end_idx + 1):
-                translations[idx] = subs[idx].text
-
-        time.sleep(0.3)  # 避免请求太频繁
+    # 先查翻译记忆，相同的句子组只请求一次
+    group_results = [None] * len(groups)
+    pending = {}  # 规范化原文 -> [group_idx, ...]
+    for group_idx, (_, _, merged_text) in enumerate(groups):
+        cached = memory.get(merged_text, ENGINE, TARGET_LANG) if memory is not None else None
+        if cached is not None:
+            group_results[group_idx] = cached
+        else:
+            pending.setdefault(normalize_text(merged_text), []).append(group_idx)
+
+    # 打包后并发翻译剩余的句子组
+    packs = pack_texts(list(pending), pack_chars)
+    print(f"🔄 使用 Google Translate 翻译... "
+          f"({len(pending)} 个句子组打包为 {len(packs)} 个请求，并发 {workers}，限速 {rps}/秒)")
+    bucket = TokenBucket(rps)
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(translate_pack, get_translator, pack, bucket, retries): pack
+            for pack in packs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            pack = futures[future]
+            try:
+                translated_pack = future.result()
+            except Exception as e:
+                failed += len(pack)
+                print(f"⚠️ 翻译失败 (组 {pending[pack[0]][0]} 起 {len(pack)} 组，已重试 {retries} 次): {e}")
+                continue
+
+            for text, translated in zip(pack, translated_pack):
+                if translated is None:
+                    failed += 1
+                    continue
+                if memory is not None:
+                    memory.put(text, ENGINE, TARGET_LANG, translated)
+                for group_idx in pending[text]:
+                    group_results[group_idx] = translated
+
+            if done % 10 == 0:
+                print(f"   处理请求 {done}/{len(futures)}...")
+
+    # 按原顺序把翻译分配回每条字幕 (失败或为空的保留原文)
+    translations = list(subs.texts)
+    flat_texts = subs.flat_texts()
+    for (start_idx, end_idx, _), translated in zip(groups, group_results):
+        if translated is None:
+            continue
+        if start_idx == end_idx:
+            # 单条字幕，直接使用翻译结果
+            split_results = [translated]
+        else:
+            # 多条字幕合并的，需要分割
+            split_results = split_translation(flat_texts[start_idx:end_idx + 1], translated)
 
-    # 更新字幕
-    for idx, trans_text in translations.items():
-        if trans_text:
-            subs[idx].text = trans_text
+        for idx, trans_text in enumerate(split_results, start=start_idx):
+            if trans_text:
+                translations[idx] = trans_text
+    zh_subs = subs.with_texts(translations)
 
     print(f"✅ 翻译完成")
-
-    # 保存
+    if failed:
+        print(f"⚠️ {failed} 个句子组重试后仍失败，保留英文原文")
+    if memory is not None:
+        stats = memory.stats()
+        print(f"   翻译缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+              f"(命中率 {stats['hit_rate']:.0%}，共 {stats['entries']} 条)")
+    report_counts(cues=total, groups=len(groups), requests=len(packs), failed_groups=failed,
+                  cache_hits=len(groups) - sum(len(idxs) for idxs in pending.values()))
+
+    # 保存 (传入 Subtitles 且未指定输出时只返回译文，不写文件)
     if output_file is None:
+        if isinstance(input_file, Subtitles):
+            return zh_subs
         base, ext = os.path.splitext(input_file)
         output_file = f"{base}_zh{ext}"
 
-    subs.save(output_file, encoding='utf-8')
+    zh_subs.save(output_file)
     print(f"📁 保存到: {output_file}")
     return output_file
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description='字幕翻译 V2 - 上下文感知翻译 (Google Translate)')
+    parser.add_argument('input', help='英文 SRT 字幕')
+    parser.add_argument('output', nargs='?', default=None, help='输出的中文 SRT (默认: <input>_zh.srt)')
+    parser.add_argument('--no-cache', action='store_true', help='不使用翻译记忆缓存')
+    parser.add_argument('--cache-db', default=DEFAULT_DB_PATH,
+                        help=f'翻译记忆缓存文件 (默认: {DEFAULT_DB_PATH})')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'翻译记忆最多保留条数 (默认: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'同时进行的翻译请求数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('--rps', type=float, default=DEFAULT_RPS,
+                        help=f'每秒最多请求数，遇到限流自动降速 (默认: {DEFAULT_RPS})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'失败后重试次数 (默认: {DEFAULT_RETRIES})')
+    parser.add_argument('--pack-chars', type=int, default=DEFAULT_PACK_CHARS,
+                        help=f'每个请求最多打包的字符数，0 表示不打包 (默认: {DEFAULT_PACK_CHARS})')
+
     if len(sys.argv) < 2:
-        print("用法: python translate_google_v2.py <input.srt> [output.srt]")
+        print("用法: python translate_google_v2.py <input.srt> [output.srt] [--no-cache]")
         print("\n特点：")
         print("  - 合并分段句子以保持上下文")
         print("  - 智能断句，翻译质量更高")
+        print("  - 翻译记忆缓存，重复运行无需重新请求")
+        print("  - 并发翻译，自动限速和重试")
+        print("  - 多个句子打包成一个请求")
         print("  - 无需 API key，完全免费")
         sys.exit(1)
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
+    args = parser.parse_args()
 
-    translate_subtitles(input_file, output_file)
+    memory = None if args.no_cache else TranslationMemory(args.cache_db, args.cache_max_entries)
+    try:
+        with profiled("translate"):
+            translate_subtitles(args.input, args.output, memory,
+                                workers=args.workers, rps=args.rps, retries=args.retries,
+                                pack_chars=args.pack_chars)
+    finally:
+        if memory is not None:
+            memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+翻译记忆缓存 - 使用 SQLite 持久化保存翻译结果
+特点：
+1. 以 (规范化原文, 翻译引擎, 目标语言) 为键
+2. 命中/未命中统计
+3. 超过容量上限时按最近使用时间淘汰
+
+用法: python translation_memory.py [db_path]   # 查看缓存状态
+"""
+
+import sys
+import os
+import re
+import time
+import hashlib
+import sqlite3
+
+# 默认缓存位置（与项目目录放在一起，多次运行共享）
+DEFAULT_DB_PATH = os.path.expanduser("~/douyin-video-tool/cache/translation_memory.db")
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def normalize_text(text: str) -> str:
+    """规范化原文：合并空白，去掉首尾空格"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def make_key(text: str, engine: str, target: str) -> str:
+    """生成缓存键"""
+    raw = f"{engine}\0{target}\0{normalize_text(text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TranslationMemory:
+    """基于 SQLite 的翻译记忆"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        # WAL 模式允许多个任务同时读写同一个缓存
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            " key TEXT PRIMARY KEY,"
+            " engine TEXT NOT NULL,"
+            " target TEXT NOT NULL,"
+            " source TEXT NOT NULL,"
+            " translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON memory(last_used)")
+        self.conn.commit()
+
+    def get(self, text: str, engine: str, target: str):
+        """查找缓存的翻译，未命中返回 None"""
+        key = make_key(text, engine, target)
+        row = self.conn.execute(
+            "SELECT translation FROM memory WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute("UPDATE memory SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0]
+
+    def put(self, text: str, engine: str, target: str, translation: str):
+        """保存翻译结果"""
+        if not translation:
+            return
+        key = make_key(text, engine, target)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO memory (key, engine, target, source, translation, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, engine, target, normalize_text(text), translation, time.time())
+        )
+        self.conn.commit()
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """超过容量上限时删除最久未使用的条目"""
+        count = len(self)
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM memory WHERE key IN "
+            "(SELECT key FROM memory ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self.conn.commit()
+        return excess
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def stats(self) -> dict:
+        """返回命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH
+    if not os.path.exists(db_path):
+        print(f"⚠️ 缓存不存在: {db_path}")
+        sys.exit(1)
+
+    memory = TranslationMemory(db_path)
+    print(f"📁 翻译缓存: {db_path}")
+    print(f"   共 {len(memory)} 条记录")
+    for engine, target, count in memory.conn.execute(
+        "SELECT engine, target, COUNT(*) FROM memory GROUP BY engine, target"
+    ):
+        print(f"   {engine} -> {target}: {count}")
+    memory.close()
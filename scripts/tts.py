@@ -7,52 +7,9 @@
 import sys
 import os
 import tempfile
-import subprocess
 import pysrt
 from openai import OpenAI
-
-def run_command(cmd, description):
-    """执行命令并在失败时退出"""
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ 失败: {description}")
-        if result.stderr:
-            print(result.stderr)
-        sys.exit(1)
-    return result
-
-def mix_segments_with_timestamps(audio_segments, output_audio, temp_dir):
-    """按字幕时间轴合并音频片段"""
-    if not audio_segments:
-        print("❌ 没有可用的音频片段")
-        sys.exit(1)
-
-    filter_lines = []
-    mix_inputs = []
-    for idx, seg in enumerate(audio_segments):
-        delay_ms = max(0, int(seg["start_ms"]))
-        filter_lines.append(f"[{idx}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
-        mix_inputs.append(f"[a{idx}]")
-
-    filter_lines.append(
-        "".join(mix_inputs)
-        + f"amix=inputs={len(audio_segments)}:duration=longest:normalize=0[aout]"
-    )
-
-    filter_script = os.path.join(temp_dir, "mix.ffmpeg")
-    with open(filter_script, "w") as f:
-        f.write(";".join(filter_lines))
-
-    cmd = ["ffmpeg", "-y"]
-    for seg in audio_segments:
-        cmd.extend(["-i", seg["path"]])
-    cmd.extend([
-        "-filter_complex_script", filter_script,
-        "-map", "[aout]",
-        "-c:a", "mp3",
-        output_audio,
-    ])
-    run_command(cmd, "合并音频片段")
+from audio_mixer import mix_segments_with_timestamps
 
 def generate_tts(input_srt: str, output_audio: str = None, voice: str = "alloy"):
     """从中文字幕生成配音"""
@@ -108,7 +65,7 @@ def generate_tts(input_srt: str, output_audio: str = None, voice: str = "alloy")
         output_audio = f"{base}_audio.mp3"
 
     print("🔧 合并音频片段（按字幕时间轴）...")
-    mix_segments_with_timestamps(audio_segments, output_audio, temp_dir)
+    mix_segments_with_timestamps(audio_segments, output_audio)
     print(f"✅ 配音完成: {output_audio}")
 
     # 清理临时文件
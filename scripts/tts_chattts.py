@@ -1,148 +1,451 @@
 #!/usr/bin/env python3
 """
 中文配音生成脚本 - 使用 ChatTTS (本地运行，完全免费)
-用法: python tts_chattts.py <chinese.srt> [output.mp3]
+用法: python tts_chattts.py <chinese.srt> [output.mp3] [seed]
 
 首次运行会自动下载模型 (~1GB)
+如果 chattts_server.py 正在运行，会自动交给它合成（模型常驻内存，不用每次重新加载）
 """
 
 import sys
 import os
-import tempfile
-import subprocess
-import pysrt
-import torch
-import ChatTTS
-import torchaudio
+import io
+import json
+import time
+import argparse
+import importlib.metadata
+import multiprocessing
+import urllib.request
 import numpy as np
+from audio_mixer import mix_segments_with_timestamps, SAMPLE_RATE
+from refine_cache import RefineCache, DEFAULT_DB_PATH as DEFAULT_REFINE_DB
+from stage_metrics import profiled, report_counts
+from subtitle_store import Subtitles, as_subtitles
+
+# 常驻 ChatTTS 服务地址，可用环境变量 CHATTTS_SERVER 覆盖
+DEFAULT_SERVER_URL = os.environ.get("CHATTTS_SERVER", "http://127.0.0.1:8765")
+MAX_BATCH_SIZE = 16  # 每批最多条数
+# 每批的填充后长度上限 = 批内最长文本长度 × 条数；同一批内的文本会被填充到最长那条
+DEFAULT_BATCH_BUDGET = 400
+
+REFINE_PROMPT = '[oral_2][laugh_0][break_4]'  # 口语化，少笑声，适当停顿
+# 文本润色结果缓存 (refine_cache.py)：润色是一次完整的 LLM 推理，相同 (模型版本, 提示词, 种子, 文本) 的结果直接复用
+
+# 推理配置:
+#   default      原有行为
+#   cpu          无 GPU 的机器: GPT/解码器线性层 int8 动态量化，按可用核数设置线程
+#   cpu-compile  在 cpu 基础上启用 torch.compile，编译产物缓存在磁盘，只在第一次付出编译时间
+PROFILES = {
+    "default": {"quantize": False, "tune_threads": False, "compile": False},
+    "cpu": {"quantize": True, "tune_threads": True, "compile": False},
+    "cpu-compile": {"quantize": True, "tune_threads": True, "compile": True},
+}
+COMPILE_CACHE_DIR = os.path.expanduser("~/douyin-video-tool/cache/torch_compile")
+
+
+def available_cores() -> int:
+    """本进程可用的 CPU 核数 (考虑 taskset / 容器限制)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class ChatTTSEngine:
+    """加载好的 ChatTTS 模型，以及按种子缓存的说话人特征"""
+
+    def __init__(self, profile: str = "default"):
+        options = PROFILES[profile]
+        if options["compile"]:
+            # 必须在导入 torch 之前设置，编译结果跨进程复用
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", COMPILE_CACHE_DIR)
+            os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+
+        # torch / ChatTTS 导入很慢，只在真正本地推理时才导入
+        import torch
+        import ChatTTS
+        self.torch = torch
+        self.ChatTTS = ChatTTS
+        self.profile = profile
+
+        if options["tune_threads"]:
+            self._tune_threads()
+
+        print(f"🔧 加载 ChatTTS 模型 (首次需要下载，配置: {profile})...")
+        start = time.perf_counter()
+        self.chat = ChatTTS.Chat()
+        with torch.inference_mode():
+            if options["tune_threads"]:
+                self.chat.load(compile=options["compile"], device=torch.device("cpu"))
+            else:
+                self.chat.load(compile=options["compile"])  # compile=True 可加速但首次编译慢
+        if options["quantize"]:
+            self._quantize()
+        self.load_seconds = time.perf_counter() - start
+        print(f"   模型加载耗时 {self.load_seconds:.1f}s")
+        self.speakers = {}
+
+    def _tune_threads(self):
+        """算子内线程用满可用核；自回归解码几乎没有算子间并行，算子间线程给少量即可"""
+        cores = available_cores()
+        self.set_threads(cores)
+        try:
+            self.torch.set_num_interop_threads(max(1, min(4, cores // 4)))
+        except RuntimeError:
+            # 已经有并行任务运行过时不能再改
+            pass
+        print(f"   线程数: 算子内 {self.torch.get_num_threads()}，算子间 {self.torch.get_num_interop_threads()}")
+
+    def set_threads(self, threads: int):
+        self.torch.set_num_threads(threads)
+
+    def _quantize(self):
+        """GPT 和解码器的线性层换成 int8 动态量化版本 (权重 int8，激活运行时量化)"""
+        quantized = []
+        for name in ("gpt", "decoder"):
+            module = getattr(self.chat, name, None)
+            if isinstance(module, self.torch.nn.Module):
+                self.torch.ao.quantization.quantize_dynamic(
+                    module, {self.torch.nn.Linear}, dtype=self.torch.qint8, inplace=True
+                )
+                quantized.append(name)
+        if quantized:
+            print(f"   int8 动态量化: {', '.join(quantized)}")
+        else:
+            print("⚠️ 当前 ChatTTS 版本找不到 gpt/decoder 模块，跳过量化")
+
+    def speaker(self, seed: int):
+        """同一种子总是得到同一个说话人，保持声音一致"""
+        if seed not in self.speakers:
+            self.torch.manual_seed(seed)
+            with self.torch.inference_mode():
+                self.speakers[seed] = self.chat.sample_random_speaker()
+        return self.speakers[seed]
+
+    def refine(self, texts: list, seed: int) -> list:
+        """只做文本润色 (加入停顿、口语化标记)，返回润色后的文本"""
+        params_refine = self.ChatTTS.Chat.RefineTextParams(prompt=REFINE_PROMPT)
+        self.torch.manual_seed(seed)
+        with self.torch.inference_mode():
+            return list(self.chat.infer(
+                texts,
+                refine_text_only=True,
+                params_refine_text=params_refine,
+            ))
+
+    def infer(self, texts: list, seed: int, skip_refine: bool = False) -> list:
+        """合成一批文本，返回与 texts 一一对应的 float32 波形 (采样率 24000)
+
+        skip_refine: 文本已经润色过 (或草稿模式不需要润色) 时跳过润色，只做语音推理
+        """
+        params_infer = self.ChatTTS.Chat.InferCodeParams(
+            spk_emb=self.speaker(seed),
+            temperature=0.3,  # 较低温度更稳定
+            top_P=0.7,
+            top_K=20,
+        )
+        params_refine = self.ChatTTS.Chat.RefineTextParams(prompt=REFINE_PROMPT)
+        with self.torch.inference_mode():
+            wavs = self.chat.infer(
+                texts,
+                skip_refine_text=skip_refine,
+                params_infer_code=params_infer,
+                params_refine_text=params_refine,
+            )
+        return [np.asarray(wav, dtype=np.float32).reshape(-1) for wav in wavs]
+
+
+def encode_wavs(wavs: list) -> bytes:
+    """把一批波形打包成 npz (arr_0, arr_1, ...)"""
+    buffer = io.BytesIO()
+    np.savez(buffer, *wavs)
+    return buffer.getvalue()
+
+
+def decode_wavs(data: bytes) -> list:
+    with np.load(io.BytesIO(data)) as npz:
+        return [npz[f"arr_{i}"] for i in range(len(npz.files))]
+
+
+def text_cost(text: str) -> int:
+    """估算文本的 token 数 (中文基本一字一个)"""
+    return len(text)
+
+
+def plan_batches(texts: list, budget: int = DEFAULT_BATCH_BUDGET, max_size: int = MAX_BATCH_SIZE) -> list:
+    """按长度排序后分批，长度相近的文本放在一起，减少填充浪费
+
+    返回 [[原始下标, ...], ...]，每批 最长长度 × 条数 不超过 budget (单条超长的文本独占一批)
+    """
+    order = sorted(range(len(texts)), key=lambda i: text_cost(texts[i]))
+    batches = []
+    current = []
+    for i in order:
+        # 升序遍历，新加入的总是当前批中最长的
+        if current and (len(current) >= max_size or (len(current) + 1) * text_cost(texts[i]) > budget):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def model_version() -> str:
+    """ChatTTS 包版本，作为润色缓存键的一部分；只读取包元数据，不导入 torch"""
+    try:
+        return importlib.metadata.version("ChatTTS")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def refine_texts(backend, texts: list, seed: int, cache: RefineCache = None,
+                 budget: int = DEFAULT_BATCH_BUDGET) -> list:
+    """润色全部文本，优先使用缓存；返回与 texts 一一对应的润色后文本
+
+    润色失败的批次保留原文，不影响后续合成
+    """
+    model = model_version() if cache is not None else None
+    refined = {}
+    missing = []
+    unique = list(dict.fromkeys(texts))
+    for text in unique:
+        cached = cache.get(text, model, REFINE_PROMPT, seed) if cache is not None else None
+        if cached is not None:
+            refined[text] = cached
+        else:
+            missing.append(text)
+
+    if missing:
+        print(f"📝 文本润色: {len(missing)} 条 (缓存命中 {len(unique) - len(missing)} 条)")
+    for batch in plan_batches(missing, budget):
+        batch_texts = [missing[i] for i in batch]
+        try:
+            results = backend.refine(batch_texts, seed)
+            if len(results) != len(batch_texts):
+                raise ValueError(f"返回 {len(results)} 条文本，期望 {len(batch_texts)} 条")
+        except Exception as e:
+            print(f"⚠️ {len(batch_texts)} 条文本润色失败，使用原文: {e}")
+            continue
+        for text, result in zip(batch_texts, results):
+            refined[text] = result
+            if cache is not None:
+                cache.put(text, model, REFINE_PROMPT, seed, result)
+
+    return [refined.get(text, text) for text in texts]
+
+
+def synthesize_texts(backend, texts: list, seed: int,
+                     budget: int = DEFAULT_BATCH_BUDGET, max_size: int = MAX_BATCH_SIZE,
+                     skip_refine: bool = False, on_batch=None) -> list:
+    """批量合成，返回与 texts 一一对应的波形，失败的条目为 None
+
+    一批失败时拆成两半重试，只有单条仍失败才放弃，不会因为一条文本让整批静音
+    on_batch: 可选，每批完成时以完成时刻 (time.time()) 调用，用于统计首批音频延迟
+    """
+    results = [None] * len(texts)
+    pending = plan_batches(texts, budget, max_size)
+    done = 0
+    while pending:
+        batch = pending.pop(0)
+        try:
+            wavs = backend.infer([texts[i] for i in batch], seed, skip_refine)
+            if len(wavs) != len(batch):
+                raise ValueError(f"返回 {len(wavs)} 条音频，期望 {len(batch)} 条")
+        except Exception as e:
+            if len(batch) == 1:
+                print(f"⚠️ 第 {batch[0] + 1} 条生成失败，跳过: {e}")
+                done += 1
+                continue
+            half = len(batch) // 2
+            print(f"⚠️ {len(batch)} 条的批次失败，拆成两半重试: {e}")
+            pending[:0] = [batch[:half], batch[half:]]
+            continue
 
-def run_command(cmd, description):
-    """执行命令并在失败时退出"""
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ 失败: {description}")
-        if result.stderr:
-            print(result.stderr)
-        sys.exit(1)
-    return result
+        for i, wav in zip(batch, wavs):
+            results[i] = wav if len(wav) else None
+        if on_batch is not None:
+            on_batch(time.time())
+        done += len(batch)
+        print(f"   已完成 {done}/{len(texts)} (本批 {len(batch)} 条)")
+    return results
+
+
+# 分片模式下 fork 出的子进程通过这个全局变量访问父进程加载好的模型 (写时复制，不重复占内存)
+_shard_engine = None
+
+
+def _synthesize_shard(job):
+    """返回 (波形列表, 本分片第一批完成的时刻)"""
+    texts, seed, budget, threads, skip_refine = job
+    _shard_engine.set_threads(threads)
+    finished = []
+    wavs = synthesize_texts(_shard_engine, texts, seed, budget, skip_refine=skip_refine, on_batch=finished.append)
+    return wavs, min(finished, default=None)
+
+
+def synthesize_sharded(engine, texts: list, seed: int, workers: int,
+                       budget: int = DEFAULT_BATCH_BUDGET, threads: int = None,
+                       skip_refine: bool = False, on_batch=None) -> list:
+    """模型加载后 fork 出 workers 个子进程，每个子进程合成一部分字幕，结果按原顺序返回
+
+    单次推理用不满多核机器，多个进程各自用固定数量的线程并行推理更快。
+    threads: 每个子进程的 torch 线程数，默认平分可用核数
+    on_batch: 同 synthesize_texts；分片模式下在全部分片结束后，以各分片第一批的完成时刻调用
+    """
+    global _shard_engine
+    if workers <= 1 or len(texts) < 2:
+        return synthesize_texts(engine, texts, seed, budget, skip_refine=skip_refine, on_batch=on_batch)
+
+    # fork 之前生成说话人特征，所有子进程继承同一个，声音保持一致
+    engine.speaker(seed)
+    threads = threads or max(1, available_cores() // workers)
+
+    # 按长度排序后轮流分配，各子进程的工作量接近
+    order = sorted(range(len(texts)), key=lambda i: text_cost(texts[i]))
+    shards = [order[w::workers] for w in range(workers)]
+    shards = [shard for shard in shards if shard]
+    print(f"   分片合成: {len(shards)} 个进程，每个 {threads} 个线程")
+
+    _shard_engine = engine
+    try:
+        with multiprocessing.get_context("fork").Pool(len(shards)) as pool:
+            outputs = pool.map(_synthesize_shard,
+                               [([texts[i] for i in shard], seed, budget, threads, skip_refine)
+                                for shard in shards])
+    finally:
+        _shard_engine = None
+
+    results = [None] * len(texts)
+    for shard, (wavs, first_finished) in zip(shards, outputs):
+        for i, wav in zip(shard, wavs):
+            results[i] = wav
+        if on_batch is not None and first_finished is not None:
+            on_batch(first_finished)
+    return results
+
+
+class ChatTTSClient:
+    """常驻 ChatTTS 服务的客户端，接口与 ChatTTSEngine.infer 相同"""
+
+    def __init__(self, url: str = DEFAULT_SERVER_URL):
+        self.url = url.rstrip("/")
+
+    def available(self) -> bool:
+        try:
+            with urllib.request.urlopen(f"{self.url}/health", timeout=0.5) as response:
+                return response.status == 200
+        except OSError:
+            return False
 
-def mix_segments_with_timestamps(audio_segments, output_audio, temp_dir):
-    """按字幕时间轴合并音频片段"""
-    if not audio_segments:
-        print("❌ 没有可用的音频片段")
-        sys.exit(1)
+    def _post(self, path: str, data: dict) -> bytes:
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=json.dumps(data).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:
+            return response.read()
+
+    def refine(self, texts: list, seed: int) -> list:
+        return json.loads(self._post("/refine", {"texts": texts, "seed": seed}))["texts"]
+
+    def infer(self, texts: list, seed: int, skip_refine: bool = False) -> list:
+        return decode_wavs(self._post("/synthesize", {"texts": texts, "seed": seed, "skip_refine": skip_refine}))
 
-    filter_lines = []
-    mix_inputs = []
-    for idx, seg in enumerate(audio_segments):
-        delay_ms = max(0, int(seg["start_ms"]))
-        filter_lines.append(f"[{idx}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
-        mix_inputs.append(f"[a{idx}]")
-
-    filter_lines.append(
-        "".join(mix_inputs)
-        + f"amix=inputs={len(audio_segments)}:duration=longest:normalize=0[aout]"
-    )
-
-    filter_script = os.path.join(temp_dir, "mix.ffmpeg")
-    with open(filter_script, "w") as f:
-        f.write(";".join(filter_lines))
-
-    cmd = ["ffmpeg", "-y"]
-    for seg in audio_segments:
-        cmd.extend(["-i", seg["path"]])
-    cmd.extend([
-        "-filter_complex_script", filter_script,
-        "-map", "[aout]",
-        "-c:a", "mp3",
-        output_audio,
-    ])
-    run_command(cmd, "合并音频片段")
 
 def generate_tts(
-    input_srt: str,
+    input_srt: "str | Subtitles",
     output_audio: str = None,
     seed: int = None,
+    server_url: str = DEFAULT_SERVER_URL,
+    batch_budget: int = DEFAULT_BATCH_BUDGET,
+    profile: str = "default",
+    workers: int = 1,
+    skip_refine: bool = False,
+    refine_cache: RefineCache = None,
 ):
-    """从中文字幕生成配音 (使用 ChatTTS)"""
+    """从中文字幕生成配音 (使用 ChatTTS)
+
+    input_srt: 字幕路径，或翻译步骤直接传来的 Subtitles (此时必须指定 output_audio)
+    server_url: 常驻服务地址；服务在运行就交给它合成，否则在本进程加载模型。None 表示总是本地加载
+    batch_budget: 每批填充后的长度上限 (最长文本长度 × 条数)
+    profile: 本地加载模型时的推理配置，见 PROFILES (使用常驻服务时由服务端决定)
+    workers: 本地推理时 fork 的进程数，大于 1 时按进程分片并行合成
+    skip_refine: 草稿模式，跳过文本润色 (速度约快一倍，语气较平)
+    refine_cache: 润色结果缓存 (refine_cache.RefineCache)，为 None 时每次都重新润色
+    """
+    if isinstance(input_srt, Subtitles) and output_audio is None:
+        raise ValueError("传入 Subtitles 时必须指定 output_audio")
+    start = time.perf_counter()
+    start_wall = time.time()
 
     # 读取字幕
-    print(f"📖 读取字幕: {input_srt}")
-    subs = pysrt.open(input_srt, encoding='utf-8')
+    if not isinstance(input_srt, Subtitles):
+        print(f"📖 读取字幕: {input_srt}")
+    subs = as_subtitles(input_srt)
     total = len(subs)
     print(f"   共 {total} 条字幕")
 
-    # 初始化 ChatTTS
-    print("🔧 加载 ChatTTS 模型 (首次需要下载)...")
-    chat = ChatTTS.Chat()
-    chat.load(compile=False)  # compile=True 可加速但首次编译慢
+    # 优先使用常驻服务（热启动），否则本地加载模型（冷启动）
+    client = ChatTTSClient(server_url) if server_url else None
+    if client is not None and client.available():
+        print(f"🔌 使用常驻 ChatTTS 服务: {client.url}")
+        backend = client
+        mode = "热启动"
+    else:
+        backend = ChatTTSEngine(profile)
+        mode = "冷启动"
 
     # 设置说话人特征 (可固定 seed 保持声音一致)
     if seed is None:
         seed = 42  # 固定种子确保声音一致
-    torch.manual_seed(seed)
-    spk = chat.sample_random_speaker()
     print(f"   使用说话人种子: {seed}")
 
-    # 参数设置
-    params_infer = ChatTTS.Chat.InferCodeParams(
-        spk_emb=spk,
-        temperature=0.3,  # 较低温度更稳定
-        top_P=0.7,
-        top_K=20,
-    )
-    params_refine = ChatTTS.Chat.RefineTextParams(
-        prompt='[oral_2][laugh_0][break_4]',  # 口语化，少笑声，适当停顿
-    )
-
-    # 创建临时目录
-    temp_dir = tempfile.mkdtemp()
     audio_segments = []
 
     # 收集所有文本
     texts = []
-    sub_info = []
-    for i, sub in enumerate(subs, start=1):
-        text = sub.text.replace('\n', ' ').strip()
+    start_times = []
+    for start_ms, text in zip(subs.starts, subs.flat_texts()):
         if text:
             texts.append(text)
-            sub_info.append((i, sub))
-
-    # 批量生成语音 (ChatTTS 支持批量处理)
+            start_times.append(start_ms)
+
+    synth_start = time.perf_counter()
+
+    # 文本润色单独做一遍并缓存，语音推理时不再重复润色
+    if skip_refine:
+        print("⚡ 草稿模式: 跳过文本润色")
+        speak_texts = texts
+    else:
+        speak_texts = refine_texts(backend, texts, seed, refine_cache, batch_budget)
+        if refine_cache is not None:
+            stats = refine_cache.stats()
+            print(f"   润色缓存: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+                  f"(命中率 {stats['hit_rate']:.0%}，共 {stats['entries']} 条)")
+
+    # 批量生成语音：按长度分桶，结果按原始顺序放回
     print(f"🎙️ 生成配音中... (共 {len(texts)} 条)")
-    batch_size = 10  # 每批处理数量
-
-    for batch_start in range(0, len(texts), batch_size):
-        batch_end = min(batch_start + batch_size, len(texts))
-        batch_texts = texts[batch_start:batch_end]
-        batch_info = sub_info[batch_start:batch_end]
-
-        print(f"   处理 {batch_start + 1}-{batch_end}/{len(texts)}...")
-
-        try:
-            wavs = chat.infer(
-                batch_texts,
-                params_infer_code=params_infer,
-                params_refine_text=params_refine,
-            )
-
-            for j, (wav, (idx, sub)) in enumerate(zip(wavs, batch_info)):
-                segment_path = os.path.join(temp_dir, f"segment_{idx:04d}.wav")
-
-                # ChatTTS 输出是 numpy array，采样率 24000
-                wav_tensor = torch.from_numpy(wav).unsqueeze(0)
-                torchaudio.save(segment_path, wav_tensor, 24000)
-
-                audio_segments.append({
-                    "path": segment_path,
-                    "start_ms": sub.start.ordinal,
-                    "text": batch_texts[j],
-                })
-
-        except Exception as e:
-            print(f"⚠️ 批次处理失败: {e}")
+    batch_finished = []  # 各批完成时刻，最早的一个即首批音频的延迟
+    if isinstance(backend, ChatTTSEngine):
+        wavs = synthesize_sharded(backend, speak_texts, seed, workers, batch_budget, skip_refine=True,
+                                  on_batch=batch_finished.append)
+    else:
+        wavs = synthesize_texts(backend, speak_texts, seed, batch_budget, skip_refine=True,
+                                on_batch=batch_finished.append)
+    synth_seconds = time.perf_counter() - synth_start
+
+    for wav, text, start_ms in zip(wavs, texts, start_times):
+        if wav is None:
             continue
-
+        # ChatTTS 输出是 numpy array，采样率 24000，直接交给混音器
+        audio_segments.append({
+            "pcm": wav,
+            "start_ms": start_ms,
+            "text": text,
+        })
+
+    report_counts(cues=total, segments=len(audio_segments), failed_segments=len(texts) - len(audio_segments))
     if not audio_segments:
         print("❌ 没有成功生成任何音频")
         sys.exit(1)
@@ -153,29 +456,55 @@ def generate_tts(
         output_audio = f"{base}_audio.mp3"
 
     print("🔧 合并音频片段（按字幕时间轴）...")
-    mix_segments_with_timestamps(audio_segments, output_audio, temp_dir)
+    mix_segments_with_timestamps(audio_segments, output_audio)
     print(f"✅ 配音完成: {output_audio}")
-
-    # 清理临时文件
-    import shutil
-    shutil.rmtree(temp_dir)
+    audio_seconds = sum(len(segment["pcm"]) for segment in audio_segments) / SAMPLE_RATE
+    first_batch_seconds = min(batch_finished) - start_wall
+    print(f"⏱️ {mode}: 首批音频 {first_batch_seconds:.1f}s，合成 {audio_seconds:.0f}s 音频用时 {synth_seconds:.1f}s "
+          f"({audio_seconds / max(synth_seconds, 1e-6):.2f}x 实时)，总耗时 {time.perf_counter() - start:.1f}s")
 
     return output_audio
 
+
 def main():
+    parser = argparse.ArgumentParser(description='中文配音生成 (ChatTTS)')
+    parser.add_argument('input', help='中文 SRT 字幕')
+    parser.add_argument('output', nargs='?', default=None, help='输出音频 (默认: <input>_audio.mp3)')
+    parser.add_argument('seed', nargs='?', type=int, default=42, help='说话人种子 (默认: 42)')
+    parser.add_argument('--server', default=DEFAULT_SERVER_URL,
+                        help=f'常驻 ChatTTS 服务地址，服务在运行时自动使用 (默认: {DEFAULT_SERVER_URL})')
+    parser.add_argument('--batch-budget', type=int, default=DEFAULT_BATCH_BUDGET,
+                        help=f'每批填充后的长度上限 (最长文本字数 × 条数)，显存/内存不足时调小 (默认: {DEFAULT_BATCH_BUDGET})')
+    parser.add_argument('--profile', default='default', choices=list(PROFILES),
+                        help='推理配置: default / cpu (int8 量化 + 线程调优) / cpu-compile (再加编译缓存) (默认: default)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='本地推理的进程数，多核机器上分片并行合成，模型只加载一次 (默认: 1)')
+    parser.add_argument('--skip-refine', action='store_true',
+                        help='草稿模式: 跳过文本润色，合成快约一倍，语气较平')
+    parser.add_argument('--no-refine-cache', action='store_true', help='不使用润色缓存')
+    parser.add_argument('--refine-cache-db', default=DEFAULT_REFINE_DB,
+                        help=f'润色缓存数据库 (默认: {DEFAULT_REFINE_DB})')
+    parser.add_argument('--no-server', action='store_true', help='不使用常驻服务，总是本地加载模型')
+
     if len(sys.argv) < 2:
         print("用法: python tts_chattts.py <chinese.srt> [output.mp3] [seed]")
         print("\n参数说明:")
         print("  seed: 说话人种子，不同数字产生不同声音 (默认: 42)")
         print("\n示例:")
         print("  python tts_chattts.py subtitles_zh.srt output.mp3 42")
+        print("\n提示: 先运行 python chattts_server.py 常驻模型，之后每个视频都不用重新加载")
         sys.exit(1)
 
-    input_srt = sys.argv[1]
-    output_audio = sys.argv[2] if len(sys.argv) > 2 else None
-    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    args = parser.parse_args()
+    cache = None if args.no_refine_cache or args.skip_refine else RefineCache(args.refine_cache_db)
+    try:
+        with profiled("tts"):
+            generate_tts(args.input, args.output, args.seed, None if args.no_server else args.server,
+                         args.batch_budget, args.profile, args.workers, args.skip_refine, cache)
+    finally:
+        if cache is not None:
+            cache.close()
 
-    generate_tts(input_srt, output_audio, seed)
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,20 @@
 #!/usr/bin/env python3
 """
 中文配音生成脚本（免费版）- 使用Microsoft Edge TTS
-用法: python tts_free.py <chinese.srt> [output.mp3]
+用法: python tts_free.py <chinese.srt> [output.mp3] [voice] [concurrency]
+
+已合成的片段会缓存到 ~/douyin-video-tool/cache/tts，修改少量字幕后重新配音只需合成改动的部分
+音频以流的方式接收并直接解码到内存，不写临时文件
 """
 
 import sys
 import os
 import asyncio
-import tempfile
-import subprocess
-import pysrt
-import edge_tts
+import argparse
+from audio_mixer import mix_segments_with_timestamps, decode_stream_to_pcm, iter_bytes
+from segment_cache import SegmentCache, segment_key, DEFAULT_CACHE_DIR, DEFAULT_MAX_MB
+from stage_metrics import profiled, report_counts
+from subtitle_store import Subtitles, as_subtitles
 
 # 可用的中文声音
 VOICES = {
@@ -22,89 +26,86 @@ VOICES = {
     "yunyang": "zh-CN-YunyangNeural",        # 男声，新闻播音风格
 }
 
-async def generate_audio_segment(text: str, voice: str, output_path: str):
-    """生成单条音频"""
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(output_path)
-
-def run_command(cmd, description):
-    """执行命令并在失败时退出"""
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"❌ 失败: {description}")
-        if result.stderr:
-            print(result.stderr)
-        sys.exit(1)
-    return result
+def engine_version() -> str:
+    """edge_tts 版本，作为缓存键的一部分；edge_tts (aiohttp) 在第一次用到时才导入"""
+    import edge_tts
+    return getattr(edge_tts, "__version__", "unknown")
 
-def mix_segments_with_timestamps(audio_segments, output_audio, temp_dir):
-    """按字幕时间轴合并音频片段"""
-    if not audio_segments:
-        print("❌ 没有可用的音频片段")
-        sys.exit(1)
+async def generate_audio_segment(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz"):
+    """流式生成单条音频，边接收边解码，返回 (MP3 数据, PCM)"""
+    import edge_tts
+    communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+    mp3 = bytearray()
 
-    filter_lines = []
-    mix_inputs = []
-    for idx, seg in enumerate(audio_segments):
-        delay_ms = max(0, int(seg["start_ms"]))
-        filter_lines.append(f"[{idx}:a]adelay={delay_ms}|{delay_ms}[a{idx}]")
-        mix_inputs.append(f"[a{idx}]")
-
-    filter_lines.append(
-        "".join(mix_inputs)
-        + f"amix=inputs={len(audio_segments)}:duration=longest:normalize=0[aout]"
-    )
-
-    filter_script = os.path.join(temp_dir, "mix.ffmpeg")
-    with open(filter_script, "w") as f:
-        f.write(";".join(filter_lines))
-
-    cmd = ["ffmpeg", "-y"]
-    for seg in audio_segments:
-        cmd.extend(["-i", seg["path"]])
-    cmd.extend([
-        "-filter_complex_script", filter_script,
-        "-map", "[aout]",
-        "-c:a", "mp3",
-        output_audio,
-    ])
-    run_command(cmd, "合并音频片段")
+    async def audio_chunks():
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                mp3.extend(chunk["data"])
+                yield chunk["data"]
+
+    pcm = await decode_stream_to_pcm(audio_chunks())
+    return bytes(mp3), pcm
 
 async def generate_tts(
-    input_srt: str,
+    input_srt: "str | Subtitles",
     output_audio: str = None,
     voice_name: str = "yunxi",
     segment_timeout: int = 20,
     concurrency: int = 5,
+    rate: str = "+0%",
+    pitch: str = "+0Hz",
+    cache: SegmentCache = None,
+    synthesize=generate_audio_segment,
 ):
-    """从中文字幕生成配音"""
+    """从中文字幕生成配音
+
+    input_srt: 字幕路径，或翻译步骤直接传来的 Subtitles (此时必须指定 output_audio)
+    cache: 配音片段缓存，为 None 时每条字幕都重新合成
+    synthesize: 合成单条音频的协程函数 (参数同 generate_audio_segment)，基准测试用它换成离线的模拟合成
+    """
 
     voice = VOICES.get(voice_name, VOICES["yunxi"])
 
+    if isinstance(input_srt, Subtitles) and output_audio is None:
+        raise ValueError("传入 Subtitles 时必须指定 output_audio")
+
     # 读取字幕
-    print(f"📖 读取字幕: {input_srt}")
-    subs = pysrt.open(input_srt, encoding='utf-8')
+    if not isinstance(input_srt, Subtitles):
+        print(f"📖 读取字幕: {input_srt}")
+    subs = as_subtitles(input_srt)
     total = len(subs)
     print(f"   共 {total} 条字幕")
     print(f"   使用声音: {voice_name} ({voice})")
 
-    # 创建临时目录
-    temp_dir = tempfile.mkdtemp()
-    audio_segments = []
-
     semaphore = asyncio.Semaphore(concurrency)
+    version = engine_version() if cache is not None else None
 
-    async def synthesize_segment(index, sub, text, segment_path):
+    async def synthesize_segment(index, start_ms, text):
         async with semaphore:
+            key = segment_key("edge-tts", version, voice, text, rate=rate, pitch=pitch)
+            cached = cache.load(key) if cache is not None else None
+            if cached is not None:
+                try:
+                    return {
+                        "pcm": await decode_stream_to_pcm(iter_bytes(cached)),
+                        "start_ms": start_ms,
+                        "text": text,
+                    }
+                except RuntimeError as e:
+                    print(f"⚠️ 缓存片段损坏，重新生成 ({index}): {e}")
+                    cache.discard(key)
+
             print(f"🎙️ 生成配音... {index}/{total}")
             try:
-                await asyncio.wait_for(
-                    generate_audio_segment(text, voice, segment_path),
+                mp3, pcm = await asyncio.wait_for(
+                    synthesize(text, voice, rate, pitch),
                     timeout=segment_timeout
                 )
+                if cache is not None:
+                    cache.store_bytes(key, mp3)
                 return {
-                    "path": segment_path,
-                    "start_ms": sub.start.ordinal,
+                    "pcm": pcm,
+                    "start_ms": start_ms,
                     "text": text,
                 }
             except asyncio.TimeoutError:
@@ -114,17 +115,24 @@ async def generate_tts(
             return None
 
     tasks = []
-    for i, sub in enumerate(subs, start=1):
-        text = sub.text.replace('\n', ' ').strip()
+    for i, (start_ms, text) in enumerate(zip(subs.starts, subs.flat_texts()), start=1):
         if not text:
             continue
-        segment_path = os.path.join(temp_dir, f"segment_{i:04d}.mp3")
         tasks.append(asyncio.create_task(
-            synthesize_segment(i, sub, text, segment_path)
+            synthesize_segment(i, start_ms, text)
         ))
 
     results = await asyncio.gather(*tasks)
     audio_segments = [seg for seg in results if seg is not None]
+    report_counts(cues=total, segments=len(audio_segments), failed_segments=len(tasks) - len(audio_segments))
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"   片段缓存: 命中 {stats['hits']} / 新合成 {stats['misses']} "
+              f"(命中率 {stats['hit_rate']:.0%})")
+        removed = cache.evict()
+        if removed:
+            print(f"   片段缓存超出上限，已清理 {removed} 个最久未使用的片段")
 
     # 合并音频
     if output_audio is None:
@@ -132,16 +140,25 @@ async def generate_tts(
         output_audio = f"{base}_audio.mp3"
 
     print("🔧 合并音频片段（按字幕时间轴）...")
-    mix_segments_with_timestamps(audio_segments, output_audio, temp_dir)
+    mix_segments_with_timestamps(audio_segments, output_audio)
     print(f"✅ 配音完成: {output_audio}")
 
-    # 清理临时文件
-    import shutil
-    shutil.rmtree(temp_dir)
-
     return output_audio
 
 def main():
+    parser = argparse.ArgumentParser(description='中文配音生成 (Edge TTS)')
+    parser.add_argument('input', help='中文 SRT 字幕')
+    parser.add_argument('output', nargs='?', default=None, help='输出音频 (默认: <input>_audio.mp3)')
+    parser.add_argument('voice', nargs='?', default='yunxi', help='声音 (默认: yunxi)')
+    parser.add_argument('concurrency', nargs='?', type=int, default=5, help='并发数 (默认: 5)')
+    parser.add_argument('--rate', default='+0%', help='语速，例如 +10%% (默认: +0%%)')
+    parser.add_argument('--pitch', default='+0Hz', help='音调，例如 -5Hz (默认: +0Hz)')
+    parser.add_argument('--no-cache', action='store_true', help='不使用配音片段缓存')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'配音片段缓存目录，多个任务可共享 (默认: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_MB,
+                        help=f'缓存目录大小上限 MB (默认: {DEFAULT_MAX_MB})')
+
     if len(sys.argv) < 2:
         print("用法: python tts_free.py <chinese.srt> [output.mp3] [voice] [concurrency]")
         print("\n可用声音:")
@@ -149,12 +166,12 @@ def main():
             print(f"  {name}: {voice}")
         sys.exit(1)
 
-    input_srt = sys.argv[1]
-    output_audio = sys.argv[2] if len(sys.argv) > 2 else None
-    voice = sys.argv[3] if len(sys.argv) > 3 else "yunxi"
-    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+    args = parser.parse_args()
+    cache = None if args.no_cache else SegmentCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
 
-    asyncio.run(generate_tts(input_srt, output_audio, voice, concurrency=concurrency))
+    with profiled("tts"):
+        asyncio.run(generate_tts(args.input, args.output, args.voice, concurrency=args.concurrency,
+                                 rate=args.rate, pitch=args.pitch, cache=cache))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+任务工作区与下载存储
+特点：
+1. 每个视频一个独立工作区 work/<video_id>/，中间文件互不干扰，多个任务可同时运行
+2. 下载的视频和字幕按内容哈希存放在 downloads/objects/，相同内容只存一份
+3. downloads/by-id/<video_id>.json 记录视频 ID 对应的下载文件，再次处理同一视频时直接复用
+4. 同一视频 ID 的下载过程加文件锁，并发任务不会重复下载
+
+用法: python workspace.py [video_id]   # 查看已下载的视频
+"""
+
+import sys
+import os
+import re
+import json
+import shutil
+import tempfile
+import fcntl
+from contextlib import contextmanager
+
+from stage_cache import sha256_file
+
+PROJECT_DIR = os.path.expanduser("~/douyin-video-tool")
+DOWNLOAD_DIR = os.path.join(PROJECT_DIR, "downloads")
+WORK_DIR = os.path.join(PROJECT_DIR, "work")
+OBJECTS_DIR = os.path.join(DOWNLOAD_DIR, "objects")
+INDEX_DIR = os.path.join(DOWNLOAD_DIR, "by-id")
+LOCKS_DIR = os.path.join(DOWNLOAD_DIR, "locks")
+
+VIDEO_ID_PATTERNS = [
+    re.compile(r'[?&]v=([A-Za-z0-9_-]{11})'),
+    re.compile(r'youtu\.be/([A-Za-z0-9_-]{11})'),
+    re.compile(r'/(?:shorts|embed|live)/([A-Za-z0-9_-]{11})'),
+]
+
+
+def extract_video_id(url: str):
+    """从 YouTube 链接中解析视频 ID，无法解析时返回 None"""
+    for pattern in VIDEO_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def job_dir(video_id: str) -> str:
+    """视频的独立工作区"""
+    path = os.path.join(WORK_DIR, video_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def staging_dir() -> str:
+    """下载用的临时目录（下载完成后文件会移入内容存储）"""
+    os.makedirs(WORK_DIR, exist_ok=True)
+    return tempfile.mkdtemp(dir=WORK_DIR, prefix=".download-")
+
+
+@contextmanager
+def video_lock(video_id: str):
+    """同一视频 ID 的下载互斥"""
+    os.makedirs(LOCKS_DIR, exist_ok=True)
+    with open(os.path.join(LOCKS_DIR, f"{video_id}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def store_object(path: str) -> str:
+    """把文件移入内容寻址存储，返回存储路径；相同内容已存在时直接复用"""
+    digest = sha256_file(path)
+    ext = os.path.splitext(path)[1]
+    dst = os.path.join(OBJECTS_DIR, digest[:2], digest + ext)
+    if os.path.abspath(path) == dst:
+        # 已经在内容存储中 (例如先单独存入的字幕)
+        return dst
+    if os.path.exists(dst):
+        os.remove(path)
+        return dst
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    shutil.move(path, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+
+def _index_path(video_id: str) -> str:
+    return os.path.join(INDEX_DIR, f"{video_id}.json")
+
+
+def load_index(video_id: str):
+    """读取视频 ID 对应的下载记录，文件缺失时返回 None"""
+    try:
+        with open(_index_path(video_id), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not all(os.path.exists(entry[key]) for key in ("video", "srt")):
+        return None
+    return entry
+
+
+def publish_download(video_id: str, title: str, video_path: str, srt_path: str) -> dict:
+    """把下载好的文件存入内容存储，并记录视频 ID 索引"""
+    entry = {
+        "id": video_id,
+        "title": title,
+        "video": store_object(video_path),
+        "srt": store_object(srt_path),
+    }
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp = f"{_index_path(video_id)}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, _index_path(video_id))
+    return entry
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        entry = load_index(sys.argv[1])
+        if not entry:
+            print(f"⚠️ 没有下载记录: {sys.argv[1]}")
+            sys.exit(1)
+        for key, value in entry.items():
+            print(f"{key}: {value}")
+        sys.exit(0)
+
+    if not os.path.isdir(INDEX_DIR):
+        print("⚠️ 还没有下载过视频")
+        sys.exit(0)
+    for name in sorted(os.listdir(INDEX_DIR)):
+        if name.endswith(".json"):
+            entry = load_index(name[:-5])
+            status = entry["title"] if entry else "⚠️ 文件缺失"
+            print(f"{name[:-5]}: {status}")